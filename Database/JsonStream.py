@@ -0,0 +1,147 @@
+import json
+import re
+
+READ_SIZE = 1 << 20  # characters read from the file at once
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"\s*")
+
+
+class _Reader:
+    """
+    Buffered reader that decodes one JSON value at a time, so only the current value is held in memory
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        # Drop the consumed part of the buffer and append the next block of the file
+        block = self.file.read(READ_SIZE)
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        self.eof = not block
+        return bool(block)
+
+    def peek(self):
+        while True:
+            self.pos = _whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON file")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at '{self.buffer[self.pos:self.pos + 40]}'")
+        self.pos += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next block
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def seek_array(self, key):
+        """
+        Moves behind the opening bracket of the first array stored under the key
+        """
+        pattern = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        while True:
+            match = pattern.search(self.buffer, self.pos)
+            if match:
+                self.pos = match.end()
+                return
+            # Keep a tail in case the pattern is split between two blocks
+            self.pos = max(self.pos, len(self.buffer) - len(key) - 64)
+            if not self._fill():
+                raise ValueError(f"No array '{key}' found in JSON file")
+
+    def items(self):
+        """
+        Yields the values of the array the reader is positioned in
+        """
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_array(path, key="contents"):
+    """
+    Stream the items of the first array stored under a key, e.g. answer.contents of an OutdoorActive response.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        reader = _Reader(file)
+        reader.seek_array(key)
+        yield from reader.items()
+
+
+def iter_object_values(path):
+    """
+    Stream the values of a top-level JSON object (e.g. {id: contents} of the public data download).
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        reader = _Reader(file)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            reader.decode()
+            reader.expect(":")
+            yield reader.decode()
+            if reader.peek() == ",":
+                reader.pos += 1
+                continue
+            reader.expect("}")
+            return
+
+
+def iter_jsonl(path):
+    """
+    Stream the objects of a JSONL file.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_tours(path, key="contents"):
+    """
+    Stream the tours of a JSONL file (one tour per line) or of the array under key in a JSON file.
+    """
+    if path.endswith(".jsonl"):
+        return iter_jsonl(path)
+    return iter_array(path, key)
+
+
+def chunked(items, size):
+    """
+    Group an iterable into lists of at most size items.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
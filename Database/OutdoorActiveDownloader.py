@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+API_BASE_URL = os.getenv("OUTDOORACTIVE_API_URL", "https://api-oa.com/api/v2/project/api-dev-oa/")
+API_KEY = os.getenv("OUTDOORACTIVE_API_KEY", "yourtest-outdoora-ctiveapi")
+
+BATCH_SIZE = 50          # ids per detail request
+WORKERS = 8              # detail requests in flight at once
+REQUESTS_PER_SECOND = 5  # sustained request rate allowed towards the API
+BURST = 10               # requests that may be sent at once after an idle phase
+RETRIES = 5              # retries per request on connection errors, 429 and 5xx
+BACKOFF_FACTOR = 1       # seconds, doubled with every retry
+TIMEOUT = 60             # seconds per request
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket: every request takes one token, tokens refill at a fixed rate
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(pool_size=WORKERS, retries=RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """
+    Session with a keep-alive connection pool for all workers and automatic retries with exponential backoff
+    (Retry-After headers of 429/503 responses are respected)
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class OutdoorActiveDownloader:
+    """
+    Downloads verbose OutdoorActive contents in parallel batches.
+
+    Every finished batch is appended to a JSONL file (one content per line) and its ids to a checkpoint file.
+    A download that is started again with the same files skips the ids in the checkpoint, so an interrupted
+    crawl continues where it stopped.
+    """
+
+    def __init__(self, base_url=API_BASE_URL, key=API_KEY, workers=WORKERS,
+                 requests_per_second=REQUESTS_PER_SECOND, burst=BURST, timeout=TIMEOUT, session=None):
+        self.base_url = base_url
+        self.key = key
+        self.workers = workers
+        self.timeout = timeout
+        self.session = session or create_session(pool_size=workers)
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.write_lock = threading.Lock()
+
+    def get(self, endpoint, params):
+        self.bucket.acquire()
+        response = self.session.get(f"{self.base_url}{endpoint}", params={"key": self.key, "format": "json", **params},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_ids(self, content_type="tour", page_size=100000):
+        """
+        Fetch the ids of all contents of a type
+        """
+        all_ids = []
+        start_index = 0
+        while True:
+            print(f"Fetching IDs starting at index {start_index}...")
+            data = self.get("contents", {"type": content_type, "typeFields": "id",
+                                         "count": page_size, "startIndex": start_index})
+            ids = [str(item["id"]) for item in data.get("answer", {}).get("contents", [])]
+            all_ids.extend(ids)
+            if len(ids) < page_size:  # No more IDs to fetch
+                return all_ids
+            start_index += page_size
+
+    def fetch_details(self, ids, lang="en"):
+        """
+        Fetch the verbose contents of a batch of ids
+        """
+        data = self.get(f"contents/{','.join(ids)}", {"display": "verbose", "lang": lang})
+        return data.get("answer", {}).get("contents", [])
+
+    def download(self, ids, output_path, checkpoint_path=None, batch_size=BATCH_SIZE, lang="en"):
+        """
+        Download the verbose contents of all ids into a JSONL file.
+
+        Parameters:
+        - ids: Content ids to download
+        - output_path: JSONL file the contents are appended to
+        - checkpoint_path: File with the ids of finished batches (default: output_path + ".checkpoint")
+        - batch_size: Number of ids per request
+        - lang: Language of the texts
+
+        Returns:
+        - int: Number of contents written in this run
+        """
+        checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+        done = load_checkpoint(checkpoint_path)
+        pending = [str(content_id) for content_id in ids if str(content_id) not in done]
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        print(f"{len(done)} IDs already downloaded, fetching {len(pending)} IDs in {len(batches)} batches")
+
+        written = 0
+        failed = 0
+        with open(output_path, "a", encoding="utf-8") as output, \
+                open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.fetch_details, batch, lang): batch for batch in batches}
+            for number, future in enumerate(as_completed(futures), start=1):
+                batch = futures[future]
+                try:
+                    contents = future.result()
+                except Exception as e:
+                    # Not checkpointed, so the batch is fetched again on the next run
+                    print(f"Failed to fetch details for {len(batch)} IDs starting with {batch[0]}: {e}")
+                    failed += 1
+                    continue
+                with self.write_lock:
+                    for content in contents:
+                        output.write(json.dumps(content, ensure_ascii=False) + "\n")
+                    output.flush()
+                    # Contents are written before their ids are checkpointed, a crash in between only repeats the batch
+                    checkpoint.write("\n".join(batch) + "\n")
+                    checkpoint.flush()
+                written += len(contents)
+                print(f"Batch {number}/{len(batches)} done ({written} contents written)")
+
+        if failed:
+            print(f"{failed} batches failed, run the download again to retry them")
+        return written
+
+
+def load_checkpoint(checkpoint_path):
+    """
+    Returns the ids recorded in a checkpoint file (empty set if the file doesn't exist)
+    """
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as file:
+        return {line.strip() for line in file if line.strip()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download verbose OutdoorActive tours into a JSONL file")
+    parser.add_argument("--output", default="response.jsonl")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--type", default="tour")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="requests per second")
+    args = parser.parse_args()
+
+    downloader = OutdoorActiveDownloader(workers=args.workers, requests_per_second=args.rate)
+    ids = downloader.fetch_ids(args.type)
+    if args.limit is not None:
+        ids = ids[:args.limit]
+    print(f"Total IDs fetched: {len(ids)}")
+    downloader.download(ids, args.output, args.checkpoint, batch_size=args.batch_size, lang=args.lang)
+    print(f"All data has been saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
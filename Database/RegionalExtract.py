@@ -0,0 +1,160 @@
+import argparse
+import json
+import sqlite3
+
+# Bounding boxes of the regions that can be extracted by name: (lat_min, lat_max, lon_min, lon_max)
+REGIONS = {
+    "bavaria": (47.2701, 50.5647, 8.9767, 13.839),
+}
+
+# Tables with one row per tour and tables referencing tours by tour_id
+TOUR_TABLE = "tours"
+CHILD_TABLES = ("tour_properties", "tour_regions")
+RTREE_TABLE = "tours_rtree"
+
+
+def ensure_spatial_index(conn):
+    """
+    Create the spatial index on the start points of the tours if it doesn't exist yet.
+    An R-tree is used if SQLite was built with it, otherwise a composite (point_lat, point_lon) index.
+    The R-tree is kept up to date by triggers when tours are inserted, updated or deleted.
+
+    Returns:
+    - bool: True if the R-tree is used
+    """
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+    except sqlite3.OperationalError:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TOUR_TABLE}_point ON {TOUR_TABLE}(point_lat, point_lon)")
+        conn.commit()
+        return False
+
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_insert AFTER INSERT ON {TOUR_TABLE}
+        WHEN NEW.point_lat IS NOT NULL AND NEW.point_lon IS NOT NULL BEGIN
+            INSERT OR REPLACE INTO {RTREE_TABLE} VALUES (NEW.rowid, NEW.point_lat, NEW.point_lat, NEW.point_lon, NEW.point_lon);
+        END;
+        CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_update AFTER UPDATE OF point_lat, point_lon ON {TOUR_TABLE} BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = OLD.rowid;
+            INSERT INTO {RTREE_TABLE} SELECT NEW.rowid, NEW.point_lat, NEW.point_lat, NEW.point_lon, NEW.point_lon
+            WHERE NEW.point_lat IS NOT NULL AND NEW.point_lon IS NOT NULL;
+        END;
+        CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_delete AFTER DELETE ON {TOUR_TABLE} BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = OLD.rowid;
+        END;
+    """)
+    # Fill the index with the tours inserted before it existed
+    conn.execute(f"""
+        INSERT INTO {RTREE_TABLE}
+        SELECT rowid, point_lat, point_lat, point_lon, point_lon FROM {TOUR_TABLE}
+        WHERE point_lat IS NOT NULL AND point_lon IS NOT NULL AND rowid NOT IN (SELECT id FROM {RTREE_TABLE})
+    """)
+    conn.commit()
+    return True
+
+
+def bbox_query(use_rtree, columns="t.*"):
+    """
+    SQL selecting the tours within a bounding box (parameters: lat_min, lat_max, lon_min, lon_max twice).
+    The R-tree stores 32 bit floats, so it only narrows down the candidates and the exact check is done on the tour columns.
+    """
+    exact = "t.point_lat BETWEEN ? AND ? AND t.point_lon BETWEEN ? AND ?"
+    if not use_rtree:
+        return f"SELECT {columns} FROM {TOUR_TABLE} t WHERE {exact}"
+    return f"""
+        SELECT {columns} FROM {RTREE_TABLE} r JOIN {TOUR_TABLE} t ON t.rowid = r.id
+        WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ? AND {exact}
+    """
+
+
+def _bbox_parameters(bbox, use_rtree):
+    lat_min, lat_max, lon_min, lon_max = bbox
+    parameters = (lat_min, lat_max, lon_min, lon_max)
+    return parameters * 2 if use_rtree else parameters
+
+
+def _table_exists(conn, table, schema="main"):
+    return conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def extract_to_db(input_db, output_db, bbox):
+    """
+    Copy all tours within a bounding box (and their properties and regions) into another SQLite database.
+    The rows are copied by SQLite itself with INSERT ... SELECT, nothing is loaded into Python.
+
+    Parameters:
+    - input_db: Database with the tours table
+    - output_db: Database the extract is written to (tables are created with the schema of the input)
+    - bbox: (lat_min, lat_max, lon_min, lon_max)
+
+    Returns:
+    - int: Number of extracted tours
+    """
+    conn = sqlite3.connect(input_db)
+    use_rtree = ensure_spatial_index(conn)
+    conn.execute("ATTACH DATABASE ? AS extract", (output_db,))
+
+    tables = [TOUR_TABLE] + [table for table in CHILD_TABLES if _table_exists(conn, table)]
+    with conn:
+        for table in tables:
+            if not _table_exists(conn, table, "extract"):
+                sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+                conn.execute(sql.replace(f"CREATE TABLE {table}", f"CREATE TABLE extract.{table}", 1)
+                             .replace(f"CREATE TABLE IF NOT EXISTS {table}", f"CREATE TABLE extract.{table}", 1))
+
+        before = conn.execute(f"SELECT COUNT(*) FROM extract.{TOUR_TABLE}").fetchone()[0]
+        conn.execute(f"INSERT OR IGNORE INTO extract.{TOUR_TABLE} {bbox_query(use_rtree)}", _bbox_parameters(bbox, use_rtree))
+        for table in tables[1:]:
+            conn.execute(f"""
+                INSERT OR IGNORE INTO extract.{table}
+                SELECT * FROM main.{table} WHERE tour_id IN (SELECT id FROM extract.{TOUR_TABLE})
+            """)
+        extracted = conn.execute(f"SELECT COUNT(*) FROM extract.{TOUR_TABLE}").fetchone()[0] - before
+
+    conn.execute("DETACH DATABASE extract")
+    conn.close()
+    print(f"Extracted {extracted} tours into {output_db}")
+    return extracted
+
+
+def extract_to_jsonl(input_db, output_path, bbox):
+    """
+    Write all tours within a bounding box as JSONL (one tour per line), streamed row by row from SQLite.
+
+    Returns:
+    - int: Number of extracted tours
+    """
+    conn = sqlite3.connect(input_db)
+    use_rtree = ensure_spatial_index(conn)
+    cursor = conn.execute(bbox_query(use_rtree), _bbox_parameters(bbox, use_rtree))
+    columns = [description[0] for description in cursor.description]
+
+    extracted = 0
+    with open(output_path, "w", encoding="utf-8") as file:
+        for row in cursor:
+            file.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+            extracted += 1
+
+    conn.close()
+    print(f"Extracted {extracted} tours into {output_path}")
+    return extracted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the tours of a region from an SQLite database")
+    parser.add_argument("--input", default="outdooractive_data.db")
+    parser.add_argument("--output", required=True, help="SQLite database or .jsonl file")
+    parser.add_argument("--region", default="bavaria", choices=sorted(REGIONS))
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("LAT_MIN", "LAT_MAX", "LON_MIN", "LON_MAX"),
+                        help="bounding box to extract instead of a named region")
+    args = parser.parse_args()
+
+    bbox = tuple(args.bbox) if args.bbox else REGIONS[args.region]
+    if args.output.endswith(".jsonl"):
+        extract_to_jsonl(args.input, args.output, bbox)
+    else:
+        extract_to_db(args.input, args.output, bbox)
+
+
+if __name__ == "__main__":
+    main()
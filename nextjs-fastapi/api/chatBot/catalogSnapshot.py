@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+# Old snapshot versions kept next to the current one (workers may still have them mapped)
+KEEP_VERSIONS = 2
+# Age in seconds after which a version without manifest is taken as an abandoned export
+ABANDONED_SECONDS = 3600
+
+
+def _encode_text(values):
+    """
+    Stores a text column as one UTF-8 byte buffer plus offsets (offsets[i] to offsets[i + 1], -1 for None).
+    """
+    encoded = [value.encode("utf-8") if isinstance(value, str) else None for value in values]
+    lengths = np.array([len(value) if value is not None else 0 for value in encoded], dtype=np.int64)
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    data = np.frombuffer(b"".join(value for value in encoded if value is not None), dtype=np.uint8)
+    missing = np.array([value is None for value in encoded], dtype=bool)
+    return data, offsets, missing
+
+
+def _decode_text(data, offsets, missing):
+    buffer = data.tobytes()
+    column = np.empty(len(missing), dtype=object)
+    column[:] = [None if missing[row] else buffer[offsets[row]:offsets[row + 1]].decode("utf-8")
+                 for row in range(len(missing))]
+    return column
+
+
+def write_snapshot(directory, columns, stamp):
+    """
+    Writes the catalog columns as a new snapshot version: one .npy file per numeric column, text columns
+    as byte buffer and offsets. The version becomes current only after all files are written.
+
+    Parameters:
+    - directory: Snapshot directory (one subdirectory per version)
+    - columns: dict of column name -> np.ndarray (object arrays are stored as text)
+    - stamp: Version stamp of the database the columns were loaded from
+
+    Returns:
+    - str: Path of the written version
+    """
+    os.makedirs(directory, exist_ok=True)
+    version_dir = tempfile.mkdtemp(prefix="snapshot-", dir=directory)
+    manifest = {"stamp": stamp, "rows": 0, "columns": {}}
+    for name, values in columns.items():
+        manifest["rows"] = len(values)
+        if values.dtype == object:
+            data, offsets, missing = _encode_text(values)
+            np.save(os.path.join(version_dir, f"{name}.data.npy"), data)
+            np.save(os.path.join(version_dir, f"{name}.offsets.npy"), offsets)
+            np.save(os.path.join(version_dir, f"{name}.missing.npy"), missing)
+            manifest["columns"][name] = "text"
+        else:
+            np.save(os.path.join(version_dir, f"{name}.npy"), values)
+            manifest["columns"][name] = values.dtype.str
+    with open(os.path.join(version_dir, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+
+    # Point CURRENT to the new version atomically, readers see either the old or the new version
+    current_tmp = os.path.join(directory, f"{CURRENT_FILE}.tmp")
+    with open(current_tmp, "w", encoding="utf-8") as file:
+        file.write(os.path.basename(version_dir))
+    os.replace(current_tmp, os.path.join(directory, CURRENT_FILE))
+    _remove_old_versions(directory, os.path.basename(version_dir))
+    print(f"Hike catalog snapshot {stamp} written to {version_dir}")
+    return version_dir
+
+
+def _remove_old_versions(directory, current):
+    """
+    Removes complete versions older than the current one beyond KEEP_VERSIONS. Versions without manifest
+    may be exports of other workers still in progress, they are only removed once they are abandoned.
+    """
+    current_mtime = os.stat(os.path.join(directory, current)).st_mtime
+    complete = []
+    for entry in os.scandir(directory):
+        if not entry.is_dir() or not entry.name.startswith("snapshot-") or entry.name == current:
+            continue
+        mtime = entry.stat().st_mtime
+        if os.path.exists(os.path.join(entry.path, MANIFEST_FILE)):
+            if mtime < current_mtime:
+                complete.append((mtime, entry.path))
+        elif time.time() - mtime > ABANDONED_SECONDS:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    for _, path in sorted(complete, reverse=True)[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def read_manifest(directory):
+    """
+    Returns the manifest of the current snapshot: stamp, rows and the kind of every column
+    ("text" or the NumPy dtype string), None if there is no snapshot.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), "r", encoding="utf-8") as file:
+            version_dir = os.path.join(directory, file.read().strip())
+        with open(os.path.join(version_dir, MANIFEST_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def read_stamp(directory):
+    """
+    Returns the version stamp of the current snapshot (None if there is no snapshot).
+    """
+    manifest = read_manifest(directory)
+    return manifest.get("stamp") if manifest else None
+
+
+def load_snapshot(directory):
+    """
+    Opens the current snapshot. Numeric columns are memory-mapped read-only, so their pages come from the
+    OS page cache and are shared by all worker processes. Text columns are decoded into Python strings,
+    so every worker still holds its own copy of the titles and descriptions (and their lowercased text index).
+
+    Returns:
+    - tuple: (stamp, dict of column name -> np.ndarray)
+    """
+    with open(os.path.join(directory, CURRENT_FILE), "r", encoding="utf-8") as file:
+        version_dir = os.path.join(directory, file.read().strip())
+    with open(os.path.join(version_dir, MANIFEST_FILE), "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    columns = {}
+    for name, kind in manifest["columns"].items():
+        if kind == "text":
+            columns[name] = _decode_text(
+                np.load(os.path.join(version_dir, f"{name}.data.npy"), mmap_mode="r"),
+                np.load(os.path.join(version_dir, f"{name}.offsets.npy"), mmap_mode="r"),
+                np.load(os.path.join(version_dir, f"{name}.missing.npy"), mmap_mode="r"),
+            )
+        else:
+            columns[name] = np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r")
+    return manifest["stamp"], columns
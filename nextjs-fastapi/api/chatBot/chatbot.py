@@ -1,7 +1,14 @@
 import openai
 import json
 import os
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from .sessionStore import SessionStore, new_session
+from .intentClassifier import IntentClassifier, INTENTS
+from .filterSchema import FILTER_TOOL, ROUTE_TOOL, clean_filters
+from .historyManager import HistoryManager
+from .llmCache import LLMCache, canonical_filters
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
 env_path = os.path.join(project_root, ".env.local")
 load_dotenv(dotenv_path=env_path)
@@ -15,6 +22,11 @@ if not openai_api_key:
 # Correctly initialize OpenAI client with the retrieved key
 client = openai.Client(api_key=openai_api_key)
 
+# Intent and hike filters in one function-calling request instead of two calls ("0" to disable)
+STRUCTURED_OUTPUT = os.getenv("CHAT_STRUCTURED_OUTPUT", "1") != "0"
+
+GPT_ERROR_REPLY = "Sorry, I encountered an issue while generating a response. 🛠️"
+
 
 class Chatbot:
     """
@@ -23,21 +35,37 @@ class Chatbot:
     """
 
     def __init__(self):
-        # User-specific memory storage
-        self.user_memory = {}
+        # User-specific memory, bounded and optionally shared between workers (see sessionStore.py)
+        self.sessions = SessionStore()
+        # Memory of the users whose message is being processed, saved when the message is done
+        self.open_sessions = {}
+        # Classifies the intent of clear messages without a GPT call
+        self.intent_classifier = IntentClassifier()
+        # Keeps the history sent to GPT within a token budget, older turns are summarized
+        self.history = HistoryManager(summarize=self._summarize)
+        # Answers of filter and city extraction for repeated messages
+        self.llm_cache = LLMCache()
         print("Chatbot initialized with support for user-specific memory")
 
+    @contextmanager
+    def session(self, user_id):
+        """
+        Loads the memory of a user for the processing of one message and saves it afterwards.
+        """
+        self.open_sessions[user_id] = self.sessions.load(user_id)
+        try:
+            yield self.open_sessions[user_id]
+        finally:
+            self.sessions.save(user_id, self.open_sessions.pop(user_id))
+
     def get_session_memory(self, user_id):
         """
         Retrieve memory for a specific user.
         If no memory exists for the user, initialize it.
         """
-        if user_id not in self.user_memory:
-            self.user_memory[user_id] = {
-                "conversation_state": {"user_filters": {}, "last_context": None},
-                "history": [],
-            }
-        return self.user_memory[user_id]
+        if user_id in self.open_sessions:
+            return self.open_sessions[user_id]
+        return self.sessions.load(user_id)
 
     def update_session_memory(self, user_id, key, value):
         """
@@ -45,16 +73,17 @@ class Chatbot:
         """
         memory = self.get_session_memory(user_id)
         memory[key] = value
+        if user_id not in self.open_sessions:
+            self.sessions.save(user_id, memory)
 
     def clear_session_memory(self, user_id):
         """
         Clear all memory for a specific user.
         """
-        if user_id in self.user_memory:
-            self.user_memory[user_id] = {
-                "conversation_state": {"user_filters": {}, "last_context": None},
-                "history": [],
-            }
+        if user_id in self.open_sessions:
+            self.open_sessions[user_id] = new_session()
+        else:
+            self.sessions.delete(user_id)
 
     def _build_system_prompt(self, mode, user_input=None):
         """
@@ -106,13 +135,54 @@ class Chatbot:
 
                 User Input: {user_input}
             """,
+            "routing": """
+            You are the assistant of a hiking app. Call route_message with the category of the user's message:
+            - 'general_chat': General conversation or casual questions.
+            - 'hike_recommendation': If the user is asking for a hike route or adjusting/refining their preferences (e.g., changing difficulty, scenery, etc.).
+            - 'clarification': Before this messages hikes may have already been recommended. If the request is asking specifically for information of a hike route that may have been provided earlier in the chat use this.
+            - 'adjust_filters': If the user is explicitly updating or changing their filters (e.g., "I don't care about waterfalls, only easy hikes").
+            - 'weather': If the user is asking about the weather (e.g., "What's the weather in New York?").
+            - 'other': Anything else unrelated or unclear.
+
+            For 'hike_recommendation' and 'adjust_filters' also set the filters mentioned in the message:
+            - Include ALL important keywords from the user input in `description_match`, even if they are already part of other filters (e.g., "waterfalls" should be in `description_match` even if it's also in `scenery`).
+            - If the user uses words like "about," "approximately," or "around" for numerical values, apply a ±20% range around the specified value and set both min and max values.
+            - Calculate point_lat and point_lon if a region is known but no coordinates are given.
+            """,
+            "summary": """
+            Summarize the conversation between a user and the assistant of a hiking app for the assistant's later turns.
+            Keep the user's preferences and filters, the places mentioned and the titles of the recommended hikes.
+            Respond with the summary only, at most 150 words.
+            """,
         }
         return prompts.get(mode, prompts["default"])
 
-    def _call_gpt(self, user_input, system_prompt, user_id):
+    def _summarize(self, summary, messages):
+        """
+        Folds messages into the running summary of a conversation. Returns None if GPT fails.
+        """
+        conversation = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        content = (f"Summary so far: {summary}\n\n" if summary else "") + f"New messages:\n{conversation}"
+        try:
+            response = client.chat.completions.create(
+                model="gpt-4-turbo",
+                messages=[
+                    {"role": "system", "content": self._build_system_prompt("summary")},
+                    {"role": "user", "content": content},
+                ],
+                max_tokens=300,
+                temperature=0.0,
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"❌ GPT API Error in _summarize: {e}")
+            return None
+
+    def _call_gpt(self, user_input, system_prompt, user_id, on_delta=None):
         """
         Unified method for interacting with GPT API.
         Sends the full conversation history along with the system prompt for a specific user.
+        With on_delta the answer is streamed and every text delta is passed to on_delta as it arrives.
         """
         # Get user-specific memory
         memory = self.get_session_memory(user_id)
@@ -120,17 +190,32 @@ class Chatbot:
         # Add user input to history
         memory.setdefault("history", []).append({"role": "user", "content": user_input})
 
-        # Construct messages with system prompt and full conversation history
-        messages = [{"role": "system", "content": system_prompt}] + memory["history"]
+        # Construct messages with system prompt and the conversation history that fits the token budget
+        messages = self.history.build_messages(memory, system_prompt)
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7,
-            )
-            reply = response.choices[0].message.content.strip()
+            if on_delta is None:
+                response = client.chat.completions.create(
+                    model="gpt-4-turbo",
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7,
+                )
+                reply = response.choices[0].message.content.strip()
+            else:
+                stream = client.chat.completions.create(
+                    model="gpt-4-turbo",
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7,
+                    stream=True,
+                )
+                parts = []
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        on_delta(chunk.choices[0].delta.content)
+                reply = "".join(parts).strip()
 
             # Add assistant's response to history
             memory["history"].append({"role": "assistant", "content": reply})
@@ -138,19 +223,158 @@ class Chatbot:
             return reply
         except Exception as e:
             print("❌ GPT API Error:", e)
-            return "Sorry, I encountered an issue while generating a response. 🛠️"
+            return GPT_ERROR_REPLY
 
-    def categorize_intent(self, user_input, user_id):
+    def _call_gpt_cached(self, kind, user_input, system_prompt, user_id, unknown="unknown"):
         """
-        Determine the intent of the user's message dynamically using history.
-        Improved to handle cases where the user is adjusting or refining filters.
+        _call_gpt for extracting something from the message (e.g. the city). GPT only gets the message,
+        not the conversation history, so the answer is reused for the same normalized message of any user.
+        If the answer is `unknown` the message may refer to an earlier one ("the weather there"),
+        so GPT is asked again with the history (not cached).
+        """
+        reply = self.llm_cache.get(kind, user_input)
+        if reply is None:
+            try:
+                response = client.chat.completions.create(
+                    model="gpt-4-turbo",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_input},
+                    ],
+                    max_tokens=500,
+                    temperature=0.0,
+                )
+                reply = response.choices[0].message.content.strip()
+            except Exception as e:
+                print("❌ GPT API Error:", e)
+                return GPT_ERROR_REPLY
+            self.llm_cache.put(kind, user_input, reply)
+        if reply.lower() == unknown:
+            return self._call_gpt(user_input, system_prompt, user_id)
+        self.add_to_history(user_id, user_input, reply)
+        return reply
+
+    def _call_tool(self, user_input, system_prompt, user_id, tool, with_history=True):
+        """
+        Calls GPT with the conversation history (only the message without with_history) and forces it
+        to answer by calling the tool, so the answer is JSON following the tool's schema.
+        Returns the parsed arguments or None.
+        """
+        pending = [{"role": "user", "content": user_input}]
+        if with_history:
+            messages = self.history.build_messages(self.get_session_memory(user_id), system_prompt, pending=pending)
+        else:
+            messages = [{"role": "system", "content": system_prompt}] + pending
+
+        try:
+            response = client.chat.completions.create(
+                model="gpt-4-turbo",
+                messages=messages,
+                tools=[tool],
+                tool_choice={"type": "function", "function": {"name": tool["function"]["name"]}},
+                max_tokens=500,
+                temperature=0.0,
+            )
+            arguments = response.choices[0].message.tool_calls[0].function.arguments
+            print("GPT Tool Call:", arguments)  # Debug print
+            return json.loads(arguments)
+        except Exception as e:
+            print("❌ GPT API Error:", e)
+            return None
+
+    def add_to_history(self, user_id, user_input, reply):
+        """
+        Adds a message and the answer to the history of a user.
         """
         memory = self.get_session_memory(user_id)
+        memory.setdefault("history", []).extend([
+            {"role": "user", "content": user_input},
+            {"role": "assistant", "content": reply},
+        ])
+
+    def extract_filters(self, user_input, user_id):
+        """
+        Extracts the hike filters of a message with one structured GPT call.
+        Returns None if GPT fails.
+        """
+        # With the cache GPT gets the message and the current filters instead of the history, so the same
+        # message with the same current filters gives the same filters for every user
+        user_filters = self.get_session_memory(user_id)["conversation_state"]["user_filters"]
+        filters = self.llm_cache.get("filters", user_input, user_filters)
+        if filters is None:
+            system_prompt = self._build_system_prompt("recommendation", user_input)
+            if self.llm_cache.enabled:
+                system_prompt += (
+                    f"\nThe user's current filters are {canonical_filters(user_filters)}. If the message changes "
+                    "them relative to their current value (e.g. 'make it shorter', 'easier'), set the new value.")
+            filters = self._call_tool(user_input, system_prompt, user_id, FILTER_TOOL,
+                                      with_history=not self.llm_cache.enabled)
+            if filters is None:
+                return None
+            filters = clean_filters(filters)
+            self.llm_cache.put("filters", user_input, filters, user_filters)
+        self.add_to_history(user_id, user_input, json.dumps(filters))
+        return filters
 
-        # Add the current user input to history temporarily for context
-        memory["history"].append({"role": "user", "content": user_input})
+    def route_message(self, user_input, user_id, with_filters=STRUCTURED_OUTPUT):
+        """
+        Determine the intent of the user's message and, for hike requests, the filters it mentions.
+        Confident cases are classified locally (see intentClassifier.py), the others are sent to GPT:
+        with_filters asks for intent and filters in one structured call, so a hike request needs no
+        second call.
 
-        # Build the categorization prompt with history
+        Returns:
+        - tuple: (intent, filters or None if they still have to be extracted)
+        """
+        # Clarification is only decided locally once there are recommended hikes to clarify
+        can_clarify = bool(self.get_session_memory(user_id).get("last_recommended_hikes"))
+        intent, local_intent = self.intent_classifier.classify(user_input, can_clarify)
+        if intent is not None:
+            print(f"🧠 Detected intent (local): {intent}")
+            if self.intent_classifier.should_audit():
+                # Check the local intent against GPT without delaying the answer
+                threading.Thread(target=self._audit_intent, args=(user_input, intent), daemon=True).start()
+            return intent, None
+
+        if with_filters:
+            # Not cached: the intent of a message like "the second one" depends on the conversation
+            result = self._call_tool(user_input, self._build_system_prompt("routing"), user_id, ROUTE_TOOL)
+            if result is not None and result.get("intent") in INTENTS:
+                intent = result["intent"]
+                print(f"🧠 Detected intent: {intent}")
+                self.intent_classifier.record(user_input, intent, local_intent)
+                if intent not in ("hike_recommendation", "adjust_filters"):
+                    return intent, None
+                filters = clean_filters(result.get("filters"))
+                self.add_to_history(user_id, user_input, json.dumps(filters))
+                return intent, filters
+
+        intent = self._gpt_intent(user_input)
+        if intent is None:
+            return "general_chat", None
+        self.intent_classifier.record(user_input, intent, local_intent)
+        return intent, None
+
+    def categorize_intent(self, user_input, user_id):
+        """
+        Determine the intent of the user's message.
+        """
+        return self.route_message(user_input, user_id, with_filters=False)[0]
+
+    def _audit_intent(self, user_input, local_intent):
+        """
+        Compares a local intent with the one GPT detects.
+        """
+        intent = self._gpt_intent(user_input)
+        if intent is not None:
+            self.intent_classifier.record(user_input, intent, local_intent, audited=True)
+
+    def _gpt_intent(self, user_input):
+        """
+        Ask GPT for the intent of the message. Returns None if GPT fails or answers with an unknown intent.
+        Improved to handle cases where the user is adjusting or refining filters.
+        """
+        # Build the categorization prompt
         messages = [
             {"role": "system", "content": self._build_system_prompt("categorization")},
             {"role": "user", "content": user_input},
@@ -166,19 +390,14 @@ class Chatbot:
             )
             intent = response.choices[0].message.content.strip().lower()
 
-            # Validate the response and remove temporary history
-            memory["history"].pop()
-            valid_intents = ["general_chat", "hike_recommendation", "clarification", "adjust_filters", "weather",
-                             "other"]
-            if intent in valid_intents:
+            # Validate the response
+            if intent in INTENTS:
                 print(f"🧠 Detected intent: {intent}")
                 return intent
             else:
                 print(f"⚠️ Unexpected intent response: {intent}")
-                return "general_chat"
+                return None
 
         except Exception as e:
             print(f"❌ GPT API Error in categorize_intent: {e}")
-            # Rollback history in case of error
-            memory["history"].pop()
-            return "general_chat"
+            return None
@@ -1,46 +1,87 @@
 import json
 from .chatbot import Chatbot
 from . import getHike
-from . import finalRecommender
 from .weather import get_weather
 import re  # Add this import
 import sys
+import threading
+import weakref
 sys.stdout.reconfigure(encoding='utf-8')
 
 # Initialize chatbot
 chatbot = Chatbot()
 
-def chatbot_loop_api(user_input, user_id, is_group_chat=False):
+class _UserLock:
+    """
+    Lock of one user, dropped from _session_locks once no request holds a reference to it.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+# Requests run on a worker pool, so messages of the same user are processed one after another
+_session_locks = weakref.WeakValueDictionary()
+_session_locks_guard = threading.Lock()
+
+def _session_lock(user_id):
+    with _session_locks_guard:
+        lock = _session_locks.get(user_id)
+        if lock is None:
+            lock = _session_locks[user_id] = _UserLock()
+        return lock
+
+def chatbot_loop_api(user_input, user_id, is_group_chat=False, emit=None):
     """
     Main API wrapper for chatbot interactions with user-specific memory.
     Updated to handle the new 'weather' intent and group chat context.
+    With emit(event, data) partial results are reported while the answer is generated:
+    "delta" for every text delta of GPT and "hikes" as soon as the hikes are scored.
     """
     if not user_input:
         return {"error": "No input provided"}
 
-    # Categorize user intent
-    intent = chatbot.categorize_intent(user_input, user_id)
+    with _session_lock(user_id), chatbot.session(user_id):
+        return _dispatch(user_input, user_id, is_group_chat, emit)
+
+def _dispatch(user_input, user_id, is_group_chat, emit=None):
+    """
+    Routes the message to the handler of its intent.
+    """
+    # Categorize user intent (hike requests may come with their filters from the same call)
+    intent, new_filters = chatbot.route_message(user_input, user_id)
 
     if intent == "other":
-        return handle_general_chat(user_input, user_id)
+        return handle_general_chat(user_input, user_id, emit)
 
     if intent == "general_chat":
-        return handle_general_chat(user_input, user_id)
+        return handle_general_chat(user_input, user_id, emit)
     elif intent == "hike_recommendation" or intent == "adjust_filters":
-        return handle_hike_recommendation(user_input, user_id, is_group_chat)
+        return handle_hike_recommendation(user_input, user_id, is_group_chat, new_filters, emit)
     elif intent == "clarification":
-        return handle_clarification(user_input, user_id)
+        return handle_clarification(user_input, user_id, emit)
     elif intent == "weather":
         return handle_weather(user_input, user_id)
     else:
         return {"response": "🤖 Sorry, I didn't understand that."}
 
-def handle_general_chat(user_input, user_id):
+def _on_delta(emit):
+    # Forwards the text deltas of a streamed GPT answer
+    if emit is None:
+        return None
+    return lambda text: emit("delta", {"text": text})
+
+def handle_general_chat(user_input, user_id, emit=None):
     """
     Handles general conversation with the chatbot for a specific user.
     """
     general_prompt = chatbot._build_system_prompt("default", user_input)
-    response = chatbot._call_gpt(user_input, general_prompt, user_id)
+    response = chatbot._call_gpt(user_input, general_prompt, user_id, on_delta=_on_delta(emit))
     return {"response": response}
 
 def extract_keywords(user_input):
@@ -59,11 +100,12 @@ def extract_keywords(user_input):
 
     return keywords
 
-def handle_hike_recommendation(user_input, user_id, is_group_chat=False):
+def handle_hike_recommendation(user_input, user_id, is_group_chat=False, new_filters=None, emit=None):
     """
     Handles hike recommendations dynamically and prioritizes matches across all text fields for a specific user.
     Supports general filter adjustments (e.g., removing waterfalls, snowy terrain, etc.).
     Always returns the full list of active filters after adjustments.
+    new_filters are the filters already extracted together with the intent (extracted here if None).
     """
     memory = chatbot.get_session_memory(user_id)
     user_filters = memory["conversation_state"]["user_filters"]
@@ -86,32 +128,27 @@ def handle_hike_recommendation(user_input, user_id, is_group_chat=False):
             if key not in user_filters or user_filters[key] is None:
                 user_filters[key] = default_value
 
-        # Extract new filters dynamically
-        system_prompt = chatbot._build_system_prompt("recommendation", user_input)
-        gpt_response = chatbot._call_gpt(user_input, system_prompt, user_id)
-
-        try:
-            new_filters = json.loads(gpt_response)
-
-            # **Fallback: Manually extract keywords and append to `description_match`**
-            extracted_keywords = extract_keywords(user_input)
-            if "description_match" not in new_filters:
-                new_filters["description_match"] = []
-            new_filters["description_match"] = list(set(new_filters["description_match"] + extracted_keywords))
-
-            # Merge new filters with existing ones
-            for key, value in new_filters.items():
-                if key in list_based_filters and isinstance(value, list):
-                    # Append new values to existing lists
-                    user_filters[key] = list(set(user_filters[key] + value))
-                else:
-                    # Update other filters
-                    user_filters[key] = value
-
-        except json.JSONDecodeError:
-            print(f"❌ GPT Response was not valid JSON: {gpt_response}")
+        # Extract new filters dynamically (structured call, the answer follows the filter schema)
+        if new_filters is None:
+            new_filters = chatbot.extract_filters(user_input, user_id)
+        if new_filters is None:
             return {"response": "I couldn't process your request. Could you provide more details?"}
 
+        # **Fallback: Manually extract keywords and append to `description_match`**
+        extracted_keywords = extract_keywords(user_input)
+        if "description_match" not in new_filters:
+            new_filters["description_match"] = []
+        new_filters["description_match"] = list(set(new_filters["description_match"] + extracted_keywords))
+
+        # Merge new filters with existing ones
+        for key, value in new_filters.items():
+            if key in list_based_filters and isinstance(value, list):
+                # Append new values to existing lists
+                user_filters[key] = list(set(user_filters[key] + value))
+            else:
+                # Update other filters
+                user_filters[key] = value
+
         # Fetch recommendations
         recommendations_df = getHike.getHike(user_filters)
 
@@ -133,6 +170,10 @@ def handle_hike_recommendation(user_input, user_id, is_group_chat=False):
             # Convert to dict for frontend
             recommendations = recommendations_df.to_dict(orient="records")
 
+            # Hike cards can be shown before the rest of the answer
+            if emit is not None:
+                emit("hikes", {"hikes": recommendations, "filters": user_filters})
+
             # Store the last 5 recommended hikes in memory
             memory["last_recommended_hikes"] = recommendations[-5:]  # Keep only the last 5 hikes
 
@@ -167,7 +208,7 @@ def handle_hike_recommendation(user_input, user_id, is_group_chat=False):
             "filters": user_filters  # Include full filter list in error case
         }
 
-def handle_clarification(user_input, user_id):
+def handle_clarification(user_input, user_id, emit=None):
     """
     Handles clarification requests dynamically for a specific user.
     If the user asks about the last 5 hikes recommended, send the hike info and user query to ChatGPT.
@@ -187,7 +228,7 @@ def handle_clarification(user_input, user_id):
         system_prompt = f"""
         You are a helpful hiking assistant. The user has asked a question about one of the last 5 hikes they were recommended.
         Here is the information about the last 5 hikes:
-        {json.dumps(last_hikes, indent=2)}
+        {json.dumps(last_hikes, separators=(",", ":"), ensure_ascii=False)}
 
         The user's query is: "{user_input}"
 
@@ -201,7 +242,7 @@ def handle_clarification(user_input, user_id):
         """
 
         # Call ChatGPT with the system prompt and user input
-        response = chatbot._call_gpt(user_input, system_prompt, user_id)
+        response = chatbot._call_gpt(user_input, system_prompt, user_id, on_delta=_on_delta(emit))
 
         return {"response": response}
 
@@ -232,7 +273,7 @@ def handle_weather(user_input, user_id):
         ]
 
         # Call ChatGPT to extract the city name
-        location=chatbot._call_gpt(user_input, system_prompt, user_id)
+        location=chatbot._call_gpt_cached("city", user_input, system_prompt, user_id)
 
         # Validate the extracted location
         if location.lower() == "unknown" or not location:
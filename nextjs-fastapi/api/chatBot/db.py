@@ -1,33 +1,137 @@
-import pandas as pd
-from supabase import create_client
 import os
-from dotenv import load_dotenv
 
-# Explicitly load the environment file
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
-env_path = os.path.join(project_root, ".env.local")
-load_dotenv(dotenv_path=env_path)
+import numpy as np
+import pandas as pd
+
+from ..dataAccess import get_supabase
+
+# Shared Supabase client (pooled HTTP session, see dataAccess.py)
+supabase = get_supabase()
+
+# Hikes requested per page (PostgREST cuts off larger responses at its row limit)
+PAGE_SIZE = int(os.getenv("HIKE_PAGE_SIZE", "1000"))
+
+
+def iter_hike_pages(columns="*", page_size=PAGE_SIZE, after_id=None):
+    """
+    Yield the hikes of the 'Activity' table page by page, ordered by id.
+    Every page continues after the last id of the previous one (keyset pagination), so pages stay
+    fast deep into the table and no hike is skipped or repeated.
+
+    Parameters:
+    - columns: Comma separated list of the columns to load (must include id)
+    - page_size: Number of hikes per page
+    - after_id: Only load hikes with a larger id
+
+    Returns:
+    - Generator of lists of dict: One list of rows per page
+    """
+    last_id = after_id
+    while True:
+        query = supabase.table("Activity").select(columns).order("id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.execute().data
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
 
-# Initialize Supabase client using environment variables
-SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-SUPABASE_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+def count_hikes(after_id=None):
+    """
+    Count the hikes in the 'Activity' table (with a larger id than after_id)
+    """
+    query = supabase.table("Activity").select("id", count="exact", head=True)
+    if after_id is not None:
+        query = query.gt("id", after_id)
+    return query.execute().count or 0
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Supabase URL or API Key is missing. Check your .env.local file.")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def _page_column(page, name, dtype):
+    values = [row.get(name) for row in page]
+    if dtype is object:
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+    return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=dtype)
 
-def fetch_hike_data():
+
+def load_hike_columns(columns, page_size=PAGE_SIZE, after_id=None, progress=None):
+    """
+    Load selected columns of the 'Activity' table into typed arrays.
+    The arrays are allocated for the counted number of hikes up front and filled page by page,
+    so only one page of the JSON response is held in memory at a time.
+
+    Parameters:
+    - columns: dict of column name -> NumPy dtype (object for text, numeric columns use NaN for missing values)
+    - page_size: Number of hikes per page
+    - after_id: Only load hikes with a larger id
+    - progress: Optional function called with (loaded, total) after every page
+
+    Returns:
+    - dict of str -> np.ndarray: One array per column
+    """
+    total = count_hikes(after_id)
+    capacity = total
+    arrays = {name: np.empty(capacity, dtype=dtype) for name, dtype in columns.items()}
+    loaded = 0
+    for page in iter_hike_pages(",".join(columns), page_size, after_id):
+        end = loaded + len(page)
+        if end > capacity:
+            # Hikes were added after counting
+            capacity = max(end, 2 * capacity)
+            arrays = {name: np.resize(array, capacity) for name, array in arrays.items()}
+        for name, dtype in columns.items():
+            arrays[name][loaded:end] = _page_column(page, name, dtype)
+        loaded = end
+        if progress is not None:
+            progress(loaded, max(total, loaded))
+    return {name: array[:loaded] for name, array in arrays.items()}
+
+
+def fetch_hikes_by_id(ids, columns="*"):
+    """
+    Fetch selected hikes from the Supabase 'Activity' table in one request.
+
+    Parameters:
+    - ids: Ids of the hikes
+    - columns: Comma separated list of the columns to load (all columns by default)
+
+    Returns:
+    - list of dict: One row per hike found (in no particular order)
+    """
+    if not len(ids):
+        return []
+    return supabase.table("Activity").select(columns).in_("id", [int(hike_id) for hike_id in ids]).execute().data
+
+
+def fetch_hike_data(columns="*", after_id=None):
     """
     Fetch hike data from the Supabase 'Activity' table.
+
+    Parameters:
+    - columns: Comma separated list of the columns to load (all columns by default)
+    - after_id: Only load hikes with a larger id (for incremental loads)
     """
     try:
-        response = supabase.table("Activity").select("*").execute()
-        if not response.data:
-            raise Exception(f"Supabase query returned no data. Response: {response}")
+        data = [row for page in iter_hike_pages(columns, after_id=after_id) for row in page]
+        if not data:
+            if after_id is not None:
+                return pd.DataFrame()  # No new hikes since the last load
+            raise Exception("Supabase query returned no data.")
         # Convert data to a DataFrame
-        return pd.DataFrame(response.data)
+        return pd.DataFrame(data)
     except Exception as e:
         print(f"❌ Error fetching hike data: {e}")
         return pd.DataFrame()  # Return an empty DataFrame on failure
 
+
+def hike_version_stamp():
+    """
+    Cheap version stamp of the 'Activity' table (number of hikes and largest id), recorded by the catalog snapshot export.
+    Edits of existing hikes don't change the stamp, a new snapshot has to be exported after them.
+    """
+    last = supabase.table("Activity").select("id").order("id", desc=True).limit(1).execute().data
+    return f"{count_hikes()}-{last[0]['id'] if last else 0}"
@@ -0,0 +1,73 @@
+from .intentClassifier import INTENTS
+
+
+def _nullable(kind, description, **extra):
+    return {"type": [kind, "null"], "description": description, **extra}
+
+
+def _string_list(description):
+    return {"type": "array", "items": {"type": "string"}, "description": description}
+
+
+# Hike filters as extracted by GPT, the same fields the "recommendation" prompt asks for
+FILTER_PROPERTIES = {
+    "region": _nullable("string", "Region, if a specific region is mentioned"),
+    "point_lat": _nullable("number", "Latitude, calculated if not specified and the region is known"),
+    "point_lon": _nullable("number", "Longitude, calculated if not specified and the region is known"),
+    "difficulty": _nullable("integer", "1 is easy, 2 is medium, 3 is hard", enum=[1, 2, 3, None]),
+    "max_length": _nullable("integer", "Maximum length in meters, e.g. 15000"),
+    "min_length": _nullable("integer", "Minimum length in meters"),
+    "duration_min": _nullable("integer", "Duration in minutes"),
+    "scenery": _string_list("e.g. ['mountains', 'forest']"),
+    "terrain": _string_list("e.g. ['rocky', 'snowy']"),
+    "is_winter": _nullable("boolean", "True if the hike is in winter"),
+    "min_altitude": _nullable("integer", "Minimum altitude in meters"),
+    "max_altitude": _nullable("integer", "Maximum altitude in meters"),
+    "description_match": _string_list(
+        "ALL important keywords of the user input, even if they are already part of other filters"),
+    "popularity": _nullable("string", "Popularity", enum=["low", "medium", "high", None]),
+    "season": _nullable("string", "e.g. 'summer', 'winter'"),
+    "fitness_level": _nullable("string", "Fitness level", enum=["beginner", "intermediate", "advanced", None]),
+    "group_size": _nullable("string", "Group size", enum=["small", "medium", "large", None]),
+    "is_pet_friendly": _nullable("boolean", "True if pets must be allowed"),
+    "facilities": _string_list("Facilities"),
+}
+
+FILTER_OBJECT = {"type": "object", "properties": FILTER_PROPERTIES}
+
+# Filter extraction only (intent already known)
+FILTER_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "set_hike_filters",
+        "description": "Set the hike filters mentioned in the user's message.",
+        "parameters": FILTER_OBJECT,
+    },
+}
+
+# Intent and filters in one call
+ROUTE_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "route_message",
+        "description": "Categorize the user's message and, for hike requests, set the hike filters it mentions.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "intent": {"type": "string", "enum": INTENTS},
+                "filters": {**FILTER_OBJECT,
+                            "description": "Only for hike_recommendation and adjust_filters"},
+            },
+            "required": ["intent"],
+        },
+    },
+}
+
+
+def clean_filters(filters):
+    """
+    Drops the filters GPT left empty (null), so they don't overwrite the defaults or earlier filters.
+    """
+    if not isinstance(filters, dict):
+        return {}
+    return {key: value for key, value in filters.items() if key in FILTER_PROPERTIES and value is not None}
@@ -0,0 +1,186 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from . import db
+from .catalogSnapshot import load_snapshot, read_manifest, write_snapshot
+from .scoringEngine import ScoringEngine
+
+# Columns of the Activity table used for scoring and for identifying the hikes, with their types
+# (the ScoringEngine uses float columns as they are, so memory-mapped snapshot columns are not copied)
+CATALOG_COLUMNS = {
+    "id": np.int64,
+    "title": object,
+    "descriptionLong": object,
+    "difficulty": np.float32,
+    "length": np.float32,
+    "minAltitude": np.float32,
+    "maxAltitude": np.float32,
+    "pointLat": np.float64,
+    "pointLon": np.float64,
+}
+# Columns of the recommended hikes shown by the frontend (HikeCard), loaded only for the top hikes
+DISPLAY_COLUMNS = [
+    "id", "title", "teaserText", "descriptionShort", "descriptionLong", "primaryImageId", "difficulty", "length",
+    "ascent", "descent", "durationMin", "minAltitude", "maxAltitude", "landscapeRating", "experienceRating",
+    "staminaRating", "primaryRegion", "isWinter", "isClosed", "publicTransportFriendly", "pointLat", "pointLon",
+]
+# Seconds between background checks for new hikes (0 = no background refresh)
+REFRESH_INTERVAL = float(os.getenv("HIKE_CATALOG_REFRESH_SECONDS", "600"))
+# Directory of the memory-mapped catalog snapshot (empty = always load from Supabase)
+SNAPSHOT_DIR = os.getenv("HIKE_SNAPSHOT_DIR", "")
+
+
+def _print_progress(loaded, total):
+    print(f"Loaded {loaded}/{total} hikes")
+
+
+def load_catalog_frame(after_id=None):
+    """
+    Loads the catalog columns page by page into a DataFrame of typed columns (hikes with a larger id than after_id).
+    """
+    return pd.DataFrame(db.load_hike_columns(CATALOG_COLUMNS, after_id=after_id, progress=_print_progress))
+
+
+def _snapshot_kinds():
+    return {name: "text" if dtype is object else np.dtype(dtype).str for name, dtype in CATALOG_COLUMNS.items()}
+
+
+def load_snapshot_frame(directory=SNAPSHOT_DIR):
+    """
+    Opens the catalog snapshot without asking the database: the stamp is written by the export step and
+    hikes added since then are loaded by the background refresh. Edits of existing hikes need a new export.
+
+    Returns:
+    - pd.DataFrame: Catalog backed by the memory-mapped snapshot files, None if there is no usable snapshot
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        print(f"No hike catalog snapshot in {directory}")
+        return None
+    if manifest.get("columns") != _snapshot_kinds():
+        print("Hike catalog snapshot has other columns or types than the catalog")
+        return None
+    stamp, columns = load_snapshot(directory)
+    print(f"Hike catalog snapshot {stamp} opened")
+    return pd.DataFrame(columns, copy=False)
+
+
+def export_snapshot(directory=SNAPSHOT_DIR):
+    """
+    Loads the catalog from Supabase and writes it as a new snapshot version.
+    """
+    stamp = db.hike_version_stamp()  # Taken before loading, hikes added meanwhile make the snapshot outdated, not wrong
+    columns = db.load_hike_columns(CATALOG_COLUMNS, progress=_print_progress)
+    write_snapshot(directory, columns, stamp)
+    return pd.DataFrame(columns)
+
+
+class HikeCatalog:
+    """
+    The hikes shared by all chat requests, loaded once with only the columns scoring needs.
+
+    Every load produces a new version with its own ScoringEngine. The engine is built before it is
+    published, so requests keep scoring the previous version while a refresh is running. A refresh
+    only loads hikes with an id above the largest id loaded so far (changes to existing hikes need a full reload).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.version = 0
+        self.hikes_df = pd.DataFrame({name: np.empty(0, dtype=dtype) for name, dtype in CATALOG_COLUMNS.items()})
+        self.engine = ScoringEngine(self.hikes_df)
+        self.watermark = None
+
+    def __len__(self):
+        return len(self.hikes_df)
+
+    def snapshot(self):
+        """
+        Returns the current version together with its scoring engine
+        """
+        with self._lock:
+            return self.version, self.engine
+
+    def _publish(self, hikes_df):
+        engine = ScoringEngine(hikes_df)
+        with self._lock:
+            self.hikes_df = hikes_df
+            self.engine = engine
+            self.watermark = int(hikes_df["id"].max()) if len(hikes_df) else None
+            self.version += 1
+            print(f"Hike catalog version {self.version}: {len(hikes_df)} hikes")
+
+    def load(self):
+        """
+        Loads the whole catalog and publishes it as a new version.
+        With a snapshot directory the snapshot is opened instead, it is only exported if there is none yet.
+        """
+        with self._refresh_lock:
+            hikes_df = load_snapshot_frame() if SNAPSHOT_DIR else None
+            if hikes_df is None and SNAPSHOT_DIR:
+                try:
+                    hikes_df = export_snapshot()
+                except Exception as e:
+                    print(f"Error writing hike catalog snapshot: {e}")
+            if hikes_df is None:
+                hikes_df = load_catalog_frame()
+            if hikes_df.empty:
+                raise Exception("No hikes loaded")
+            self._publish(hikes_df)
+
+    def refresh(self):
+        """
+        Loads the hikes added since the last load. A new version is only published if there are new hikes.
+
+        Returns:
+        - int: Number of new hikes
+        """
+        with self._refresh_lock:
+            if self.watermark is None:
+                self.load()
+                return len(self)
+            new_hikes = load_catalog_frame(after_id=self.watermark)
+            if new_hikes.empty:
+                return 0
+            self._publish(pd.concat([self.hikes_df, new_hikes], ignore_index=True))
+            return len(new_hikes)
+
+    def _refresh_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing hike catalog: {e}")
+
+    def start_refresh(self, interval=REFRESH_INTERVAL):
+        """
+        Starts checking for new hikes in a background thread every interval seconds
+        """
+        if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, args=(interval,),
+                                        name="hike-catalog-refresh", daemon=True)
+        self._thread.start()
+
+    def stop_refresh(self):
+        """
+        Stops the background refresh (called on application shutdown)
+        """
+        self._stop.set()
+
+
+# Shared by getHike and the API
+hike_catalog = HikeCatalog()
+
+
+if __name__ == "__main__":
+    # Export step, e.g. after an import: python -m api.chatBot.hikeCatalog <snapshot directory>
+    import sys
+    export_snapshot(sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_DIR or "hike_snapshot")
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+# Tokens of conversation history (summary included) sent with one GPT call
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+# Latest turns (user message + answer) always sent verbatim
+HISTORY_KEEP_TURNS = int(os.getenv("CHAT_HISTORY_KEEP_TURNS", "3"))
+# Turns that don't fit into the budget any more, collected before they are summarized together
+HISTORY_FOLD_TURNS = int(os.getenv("CHAT_HISTORY_FOLD_TURNS", "3"))
+# Tokens an older message may have before it is cut (bulky payloads like filter JSON or hike details)
+HISTORY_MAX_MESSAGE_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_MESSAGE_TOKENS", "200"))
+# Tokens per message for the role and formatting
+MESSAGE_OVERHEAD = 4
+
+
+def count_tokens(text):
+    """
+    Number of tokens of a text (estimated from its length if tiktoken is not installed).
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def _message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def _cut(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max_tokens]) + " …"
+    return text[:max_tokens * 4] + " …"
+
+
+class HistoryManager:
+    """
+    Builds the messages sent to GPT from a user's memory within a token budget.
+
+    The latest HISTORY_KEEP_TURNS turns are always sent verbatim. Older messages are sent with bulky content
+    cut, as far as they fit into the budget. The ones that don't fit are left out, and once HISTORY_FOLD_TURNS
+    turns have been left out they are folded into a running summary (one GPT call via summarize), which is
+    kept in the memory and sent instead of them. If summarizing fails the left out messages are dropped.
+    The tokens the full history would have cost are tracked, stats() reports the tokens saved.
+
+    Summarizing runs inside the request that overflows the budget, so that answer waits for one extra
+    GPT call (summary_seconds in stats()). It runs at most once every HISTORY_FOLD_TURNS left out turns;
+    a larger value makes it rarer at the cost of a longer summary call. It isn't moved to the background
+    because the memory is saved with the session at the end of the request.
+    """
+
+    def __init__(self, summarize=None, budget: int = HISTORY_TOKEN_BUDGET, keep_turns: int = HISTORY_KEEP_TURNS,
+                 fold_turns: int = HISTORY_FOLD_TURNS, max_message_tokens: int = HISTORY_MAX_MESSAGE_TOKENS):
+        self.summarize = summarize
+        self.fold_turns = fold_turns
+        self.budget = budget
+        self.keep_turns = keep_turns
+        self.max_message_tokens = max_message_tokens
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "history_tokens": 0, "sent_tokens": 0, "summaries": 0, "summary_seconds": 0.0}
+
+    def _fold(self, memory, messages):
+        """
+        Folds messages into the running summary of the memory. Returns False if summarizing failed.
+        """
+        if self.summarize is None:
+            return False
+        started = time.perf_counter()
+        summary = self.summarize(memory.get("summary"), messages)
+        with self._lock:
+            self.counts["summary_seconds"] += time.perf_counter() - started
+        if not summary:
+            return False
+        memory["summary"] = summary
+        with self._lock:
+            self.counts["summaries"] += 1
+        return True
+
+    def build_messages(self, memory, system_prompt, pending=None):
+        """
+        Returns the messages for a GPT call: system prompt, summary of older turns and the history
+        that fits into the budget, followed by the pending messages (not part of the history yet).
+        Older messages that don't fit are eventually folded into the summary and removed from memory["history"].
+        """
+        history = memory.setdefault("history", [])
+        pending = pending or []
+        keep = min(len(history), 2 * self.keep_turns)
+        older = [{**message, "content": _cut(message["content"], self.max_message_tokens)}
+                 for message in history[:len(history) - keep]]
+        recent = history[len(history) - keep:]
+
+        # Older messages are sent newest first as long as they fit into the budget
+        available = self.budget - count_tokens(memory.get("summary")) - sum(_message_tokens(m) for m in recent)
+        first_sent = len(older)
+        while first_sent > 0 and _message_tokens(older[first_sent - 1]) <= available:
+            first_sent -= 1
+            available -= _message_tokens(older[first_sent])
+        # The ones that don't fit are folded into the summary once there are enough of them
+        overflow = older[:first_sent]
+        if overflow and (len(overflow) >= 2 * self.fold_turns or not self.summarize):
+            if not self._fold(memory, overflow) and self.summarize:
+                print(f"⚠️ History summary failed, dropping {len(overflow)} old messages")
+            memory["folded_tokens"] = memory.get("folded_tokens", 0) + sum(
+                _message_tokens(message) for message in history[:len(overflow)])
+            del history[:len(overflow)]
+        older = older[first_sent:]
+
+        messages = [{"role": "system", "content": system_prompt}]
+        if memory.get("summary"):
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {memory['summary']}"})
+        messages += older + recent + pending
+
+        full_tokens = memory.get("folded_tokens", 0) + sum(_message_tokens(message) for message in history)
+        sent_tokens = sum(_message_tokens(message) for message in messages[1:len(messages) - len(pending)])
+        with self._lock:
+            self.counts["calls"] += 1
+            self.counts["history_tokens"] += full_tokens
+            self.counts["sent_tokens"] += sent_tokens
+        return messages
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {**counts, "saved_tokens": counts["history_tokens"] - counts["sent_tokens"],
+                "budget": self.budget, "keep_turns": self.keep_turns, "tokenizer": _encoding is not None}
@@ -0,0 +1,261 @@
+import json
+import os
+import random
+import re
+import threading
+import zlib
+
+import numpy as np
+
+INTENTS = ["general_chat", "hike_recommendation", "clarification", "adjust_filters", "weather", "other"]
+
+# Trained model (.npz written by train_model), empty = keyword rules only
+INTENT_MODEL = os.getenv("CHAT_INTENT_MODEL", "")
+# Probability the model needs before its intent is used without asking GPT
+INTENT_THRESHOLD = float(os.getenv("CHAT_INTENT_THRESHOLD", "0.85"))
+# JSONL file the intents detected by GPT are appended to (training data for the model), empty = off
+INTENT_LOG = os.getenv("CHAT_INTENT_LOG", "")
+# Share of the locally classified messages that are also sent to GPT in the background to measure agreement
+INTENT_AUDIT_RATE = float(os.getenv("CHAT_INTENT_AUDIT_RATE", "0"))
+
+N_FEATURES = 1 << 18
+NGRAM_RANGE = (2, 3, 4)
+
+# Intents that are certain when the message matches, checked before the model. A message matching the
+# rules of more than one intent is left to the model (hike_recommendation and adjust_filters are handled
+# the same way, so they don't count as a conflict). Weather only matches asking for the weather of a
+# place or day, not every mention of it ("What temperature is best for hiking?").
+INTENT_RULES = {
+    "weather": re.compile(
+        r"\b(weather (in|at|for|near|around|like|today|tomorrow|this weekend)|wetter (in|am|für|heute|morgen)"
+        r"|forecast|wettervorhersage)\b",
+        re.IGNORECASE),
+    "clarification": re.compile(
+        r"\b((tell me more|more (info|information|details)) about (it|that|this|them|these|those)"
+        r"|the (first|second|third|fourth|fifth|last) (one|hike|route))\b",
+        re.IGNORECASE),
+    "adjust_filters": re.compile(
+        r"\b(don'?t care about|no longer|make it (easier|harder|shorter|longer)|only (easy|medium|hard|short|long) (ones|hikes))\b",
+        re.IGNORECASE),
+    "hike_recommendation": re.compile(
+        r"\b(recommend|suggest|find|show|looking for|search(ing)? for)\b.*\b(hikes?|hiking|trails?|tours?|routes?|walks?)\b",
+        re.IGNORECASE),
+    "general_chat": re.compile(
+        r"^\s*(hi|hello|hey|hallo|servus|moin|thanks|thank you|danke|good (morning|evening|night)|bye)[\s!.?]*$",
+        re.IGNORECASE),
+}
+_SAME_HANDLER = {"hike_recommendation": "hike", "adjust_filters": "hike"}
+
+
+def _features(text):
+    """
+    Hashed character n-grams of the normalized text, as column indices and L2-normalized counts.
+    """
+    text = f" {' '.join(text.lower().split())} "
+    grams = [text[i:i + n] for n in NGRAM_RANGE for i in range(len(text) - n + 1)]
+    if not grams:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    columns, counts = np.unique([zlib.crc32(gram.encode("utf-8")) % N_FEATURES for gram in grams],
+                                return_counts=True)
+    return columns, counts / np.linalg.norm(counts)
+
+
+def _feature_matrix(texts):
+    # Sparse rows as (row of every entry, column, value)
+    features = [_features(text) for text in texts]
+    rows = np.repeat(np.arange(len(features)), [len(columns) for columns, _ in features])
+    columns = np.concatenate([columns for columns, _ in features])
+    values = np.concatenate([values for _, values in features])
+    return rows, columns, values
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def train_model(texts, intents, epochs: int = 200, learning_rate: float = 0.05, l2: float = 1e-5):
+    """
+    Trains the multinomial logistic regression over hashed character n-grams (full-batch Adam).
+
+    Parameters:
+    - texts: Messages
+    - intents: Intent of each message (as detected by GPT)
+
+    Returns:
+    - dict: weights, bias and labels of the model
+    """
+    labels = sorted(set(intents))
+    label_index = {label: i for i, label in enumerate(labels)}
+    targets = np.zeros((len(texts), len(labels)))
+    targets[np.arange(len(texts)), [label_index[intent] for intent in intents]] = 1.0
+
+    rows, columns, values = _feature_matrix(texts)
+    used, local_columns = np.unique(columns, return_inverse=True)
+    # Entries are grouped by row; a second order groups them by column for the gradient
+    texts_with_features = np.unique(rows)
+    row_starts = np.searchsorted(rows, texts_with_features)
+    by_column = np.argsort(local_columns, kind="stable")
+    column_starts = np.searchsorted(local_columns[by_column], np.arange(len(used)))
+
+    parameters = [np.zeros((len(used), len(labels))), np.zeros(len(labels))]
+    moments = [[np.zeros_like(parameter), np.zeros_like(parameter)] for parameter in parameters]
+    for step in range(1, epochs + 1):
+        weights, bias = parameters
+        logits = np.zeros((len(texts), len(labels)))
+        logits[texts_with_features] = np.add.reduceat(weights[local_columns] * values[:, None], row_starts)
+        error = (_softmax(logits + bias) - targets) / len(texts)
+        entry_gradients = (error[rows] * values[:, None])[by_column]
+        gradients = [np.add.reduceat(entry_gradients, column_starts) + l2 * weights, error.sum(axis=0)]
+        for parameter, gradient, (first, second) in zip(parameters, gradients, moments):
+            first += 0.1 * (gradient - first)
+            second += 0.001 * (gradient ** 2 - second)
+            parameter -= learning_rate * (first / (1 - 0.9 ** step)) / (np.sqrt(second / (1 - 0.999 ** step)) + 1e-8)
+
+    weights, bias = parameters
+    full_weights = np.zeros((N_FEATURES, len(labels)), dtype=np.float32)
+    full_weights[used] = weights
+    return {"weights": full_weights, "bias": bias, "labels": np.array(labels)}
+
+
+def save_model(model, path):
+    np.savez_compressed(path, **model)
+
+
+def load_model(path):
+    with np.load(path) as data:
+        return {"weights": data["weights"], "bias": data["bias"], "labels": [str(label) for label in data["labels"]]}
+
+
+def load_log(path):
+    """
+    Reads the logged messages and their GPT intents (the latest intent wins for repeated messages).
+    """
+    labelled = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                item = json.loads(line)
+                if item.get("intent") in INTENTS:
+                    labelled[item["text"]] = item["intent"]
+    return list(labelled), list(labelled.values())
+
+
+class IntentClassifier:
+    """
+    Local intent classification in front of the GPT call of Chatbot.categorize_intent.
+
+    A message is classified by the keyword rules, then by the model if one is trained; only if neither is
+    confident (probability below the threshold) GPT is asked. The intents GPT returns can be logged and used
+    to train the model (python -m api.chatBot.intentClassifier <log> <model>).
+    """
+
+    def __init__(self, model_path: str = INTENT_MODEL, threshold: float = INTENT_THRESHOLD,
+                 log_path: str = INTENT_LOG, audit_rate: float = INTENT_AUDIT_RATE):
+        self.threshold = threshold
+        self.log_path = log_path
+        self.audit_rate = audit_rate
+        self.model = None
+        if model_path:
+            try:
+                self.model = load_model(model_path)
+                print(f"Intent model loaded from {model_path} ({len(self.model['labels'])} intents)")
+            except (OSError, KeyError, ValueError) as e:
+                print(f"⚠️ Intent model not loaded, using keyword rules only: {e}")
+        self._lock = threading.Lock()
+        self.counts = {"rule": 0, "model": 0, "gpt": 0, "audited": 0, "audit_agreed": 0,
+                       "fallback_guessed": 0, "fallback_agreed": 0}
+
+    def _rule_intent(self, text, can_clarify=True):
+        matches = {intent for intent, pattern in INTENT_RULES.items()
+                   if (can_clarify or intent != "clarification") and pattern.search(text)}
+        if len({_SAME_HANDLER.get(intent, intent) for intent in matches}) == 1:
+            # adjust_filters is the more specific of the two hike intents
+            return "adjust_filters" if "adjust_filters" in matches else matches.pop()
+        return None
+
+    def predict(self, text, can_clarify=True):
+        """
+        Returns the local intent of a message
+
+        Parameters:
+        - text: Message of the user
+        - can_clarify: False if no hikes were recommended yet, then clarification is never the local intent
+
+        Returns:
+        - tuple: (intent, probability, source), source is "rule", "model" or None if there is no local guess
+        """
+        intent = self._rule_intent(text, can_clarify)
+        if intent is not None:
+            return intent, 1.0, "rule"
+        if self.model is None:
+            return None, 0.0, None
+        columns, values = _features(text)
+        probabilities = _softmax(values @ self.model["weights"][columns] + self.model["bias"])
+        best = int(np.argmax(probabilities))
+        if not can_clarify and self.model["labels"][best] == "clarification":
+            # Left to GPT, which sees the conversation
+            return None, 0.0, None
+        return self.model["labels"][best], float(probabilities[best]), "model"
+
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self.counts[name] += 1
+
+    def classify(self, text, can_clarify=True):
+        """
+        Returns the intent of a message if it can be decided locally, otherwise None (ask GPT)
+        and the best local guess (can_clarify as in predict)
+
+        Returns:
+        - tuple: (intent or None, best local guess or None)
+        """
+        intent, probability, source = self.predict(text, can_clarify)
+        if source is not None and probability >= self.threshold:
+            self._count(source)
+            return intent, intent
+        self._count("gpt")
+        return None, intent
+
+    def should_audit(self):
+        return self.audit_rate > 0 and random.random() < self.audit_rate
+
+    def record(self, text, gpt_intent, local_intent=None, audited=False):
+        """
+        Logs the intent GPT detected for a message and compares it with the local one
+        """
+        if audited:
+            self._count("audited", *(["audit_agreed"] if local_intent == gpt_intent else []))
+        elif local_intent is not None:
+            self._count("fallback_guessed", *(["fallback_agreed"] if local_intent == gpt_intent else []))
+        if self.log_path:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"text": text, "intent": gpt_intent}, ensure_ascii=False) + "\n")
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        messages = counts["rule"] + counts["model"] + counts["gpt"]
+        return {
+            **counts,
+            "messages": messages,
+            "local_rate": (counts["rule"] + counts["model"]) / messages if messages else 0.0,
+            # Confident local intents checked against GPT
+            "agreement": counts["audit_agreed"] / counts["audited"] if counts["audited"] else None,
+            # Best local guess of the messages sent to GPT (helps choosing the threshold)
+            "fallback_agreement": counts["fallback_agreed"] / counts["fallback_guessed"]
+            if counts["fallback_guessed"] else None,
+            "threshold": self.threshold,
+            "model_loaded": self.model is not None,
+        }
+
+
+if __name__ == "__main__":
+    # Training step: python -m api.chatBot.intentClassifier <intent log> <model file>
+    import sys
+    texts, intents = load_log(sys.argv[1] if len(sys.argv) > 1 else INTENT_LOG)
+    model = train_model(texts, intents)
+    save_model(model, sys.argv[2] if len(sys.argv) > 2 else INTENT_MODEL or "intent_model.npz")
+    print(f"Intent model trained on {len(texts)} messages")
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+
+from ..kvStore import create_kv_store
+
+# "local" (per worker), "redis" (REDIS_URL, shared by all workers) or "off"
+LLM_CACHE_BACKEND = os.getenv("CHAT_LLM_CACHE", "local").lower()
+# Seconds an answer is kept
+LLM_CACHE_TTL = float(os.getenv("CHAT_LLM_CACHE_TTL", "86400"))
+# Answers kept by the local backend
+LLM_CACHE_SIZE = int(os.getenv("CHAT_LLM_CACHE_SIZE", "5000"))
+# Increase when the prompts change, so answers to the old prompts are not used
+CACHE_VERSION = 2
+KEY_PREFIX = f"llm:{CACHE_VERSION}:"
+
+
+def normalize_input(text):
+    """
+    Normalizes a message for the cache key: Unicode NFKC, lower case, single spaces, no trailing punctuation.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return re.sub(r"[\s.!?]+$", "", " ".join(text.split()))
+
+
+def canonical_filters(filters):
+    """
+    Canonical JSON of the current filters: sorted keys, lists sorted (they are merged as sets), no empty values.
+    """
+    canonical = {}
+    for key, value in (filters or {}).items():
+        if value is None or value == []:
+            continue
+        canonical[key] = sorted(value, key=str) if isinstance(value, list) else value
+    return json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class LLMCache:
+    """
+    Answers of GPT calls that only depend on the message and the current filters (filter and city extraction,
+    sent without the conversation history), so repeated requests don't call GPT.
+
+    Keys are the kind of call plus a hash of the normalized message and the canonical filters. Entries
+    expire after LLM_CACHE_TTL seconds; the local backend additionally evicts the least recently used.
+    """
+
+    def __init__(self, backend: str = LLM_CACHE_BACKEND, ttl: float = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_SIZE):
+        self.store = None if backend == "off" else create_kv_store(backend, max_entries)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    def _key(self, kind, user_input, user_filters):
+        digest = hashlib.sha256(
+            f"{normalize_input(user_input)}\0{canonical_filters(user_filters)}".encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}{kind}:{digest}"
+
+    def _count(self, kind, name):
+        with self._lock:
+            counts = self.counts.setdefault(kind, {"hits": 0, "misses": 0})
+            counts[name] += 1
+
+    def get(self, kind, user_input, user_filters=None):
+        """
+        Returns the cached answer of a call (None if there is none).
+
+        Parameters:
+        - kind: Kind of call, e.g. "filters" or "city"
+        - user_input: Message of the user
+        - user_filters: Current filters of the user, if the answer depends on them
+        """
+        if self.store is None:
+            return None
+        value = self.store.get(self._key(kind, user_input, user_filters))
+        self._count(kind, "misses" if value is None else "hits")
+        return None if value is None else json.loads(value)
+
+    def put(self, kind, user_input, answer, user_filters=None):
+        if self.store is not None:
+            self.store.set(self._key(kind, user_input, user_filters),
+                           json.dumps(answer, separators=(",", ":"), ensure_ascii=False), self.ttl)
+
+    def stats(self):
+        with self._lock:
+            kinds = {kind: {**counts, "hit_rate": counts["hits"] / (counts["hits"] + counts["misses"])}
+                     for kind, counts in self.counts.items()}
+        if self.store is None:
+            return {"backend": "off", "kinds": kinds}
+        return {**self.store.stats(KEY_PREFIX), "ttl": self.ttl, "kinds": kinds}
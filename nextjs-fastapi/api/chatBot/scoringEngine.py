@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+from .spatialIndex import GridIndex
+from .textIndex import TextIndex
+
+# Weights of the partial scores in the final score
+KEYWORD_WEIGHT = 0.4
+PROXIMITY_WEIGHT = 0.3
+DIFFICULTY_WEIGHT = 0.2
+LENGTH_WEIGHT = 0.3
+ALTITUDE_WEIGHT = 0.2
+
+# Proximity score for hikes up to the given distance in km (farther hikes score 0)
+PROXIMITY_RINGS = ((10, 100), (30, 70), (50, 50))
+MAX_PROXIMITY_KM = PROXIMITY_RINGS[-1][0]
+
+
+def _column(hikes_df, name, default=np.nan):
+    """
+    Returns a column as float array (default value if the column is missing).
+    Float columns are used as they are, e.g. memory-mapped snapshot columns stay shared between workers.
+    """
+    if name not in hikes_df.columns:
+        return np.full(len(hikes_df), default, dtype=float)
+    column = hikes_df[name].to_numpy()
+    if column.dtype.kind == "f":
+        return column
+    return pd.to_numeric(hikes_df[name], errors="coerce").to_numpy(dtype=float)
+
+
+def _filter_value(user_filters, key, default):
+    value = user_filters.get(key)
+    return default if value is None else value
+
+
+def proximity_from_distance(distances):
+    """
+    Map distances in km to proximity scores (NaN distances score 0).
+    """
+    scores = np.zeros(len(distances))
+    for max_distance, score in reversed(PROXIMITY_RINGS):
+        scores[distances <= max_distance] = score
+    return scores
+
+
+class ScoringEngine:
+    """
+    Scores all hikes for a set of user filters with NumPy array expressions.
+    The columns needed for scoring are extracted once when the engine is created.
+    """
+
+    def __init__(self, hikes_df):
+        self.hikes_df = hikes_df.reset_index(drop=True)
+        self.difficulty = _column(self.hikes_df, "difficulty")
+        self.length = _column(self.hikes_df, "length", 0)
+        self.min_altitude = _column(self.hikes_df, "minAltitude", 0)
+        self.max_altitude = _column(self.hikes_df, "maxAltitude", 0)
+        self.lat = _column(self.hikes_df, "pointLat")
+        self.lon = _column(self.hikes_df, "pointLon")
+        self.grid = GridIndex(self.lat, self.lon)
+        # Titles are short and compared in full, long descriptions go through the term index
+        self.text_indexes = [
+            TextIndex(self.hikes_df[name] if name in self.hikes_df.columns else [None] * len(self.hikes_df),
+                      prune=prune)
+            for name, prune in (("title", False), ("descriptionLong", True))
+        ]
+
+    def __len__(self):
+        return len(self.hikes_df)
+
+    def keyword_scores(self, keywords, threshold=70):
+        """
+        Match keywords across title and long description and compute a match score per hike.
+        """
+        scores = np.zeros(len(self))
+        for keyword in keywords:
+            for text_index in self.text_indexes:
+                rows, similarities = text_index.match(keyword, threshold)
+                scores[rows] += similarities / 100 * 20  # Scale score
+        return np.minimum(scores, 100)  # Cap score at 100
+
+    def proximity_scores(self, user_lat, user_lon):
+        """
+        Calculate proximity scores based on the haversine distance to the user location.
+        Only hikes within the outermost ring are looked at, all others score 0.
+        """
+        scores = np.zeros(len(self))
+        rows, distances = self.grid.query_radius(user_lat, user_lon, MAX_PROXIMITY_KM)
+        scores[rows] = proximity_from_distance(distances)
+        return scores
+
+    def score(self, user_filters):
+        """
+        Compute keyword, proximity and final scores of all hikes.
+
+        Returns:
+        - tuple of np.ndarray: keyword scores, proximity scores, final scores
+        """
+        keyword_score = np.zeros(len(self))
+        if user_filters.get("description_match"):
+            keyword_score = self.keyword_scores(user_filters["description_match"])
+
+        proximity_score = np.zeros(len(self))
+        if user_filters.get("point_lat") and user_filters.get("point_lon"):
+            proximity_score = self.proximity_scores(user_filters["point_lat"], user_filters["point_lon"])
+
+        # Comparisons with NaN are False, so hikes with missing values score 0 like before
+        with np.errstate(invalid="ignore"):
+            difficulty_score = np.zeros(len(self))
+            if user_filters.get("difficulty") is not None:
+                difficulty_score = np.where(self.difficulty == user_filters["difficulty"], 100, 0)
+
+            # Length score (make-or-break criteria)
+            min_length = _filter_value(user_filters, "min_length", 0)
+            max_length = _filter_value(user_filters, "max_length", np.inf)
+            length_score = np.where((min_length <= self.length) & (self.length <= max_length), 100, 0)
+
+            # Check if hike altitude falls within user altitude range
+            min_altitude = _filter_value(user_filters, "min_altitude", 0)
+            max_altitude = _filter_value(user_filters, "max_altitude", np.inf)
+            altitude_score = np.where(
+                (self.min_altitude >= min_altitude) & (self.max_altitude <= max_altitude), 100, 0)
+
+        final_score = (
+                KEYWORD_WEIGHT * keyword_score +
+                PROXIMITY_WEIGHT * proximity_score +
+                DIFFICULTY_WEIGHT * difficulty_score +
+                LENGTH_WEIGHT * length_score +
+                ALTITUDE_WEIGHT * altitude_score
+        )
+        return keyword_score, proximity_score, final_score
+
+    def recommend(self, user_filters, top_n=5):
+        """
+        Return the top_n hikes with their scores, best first.
+        """
+        keyword_score, proximity_score, final_score = self.score(user_filters)
+
+        top_n = min(top_n, len(self))
+        top = np.argpartition(-final_score, top_n - 1)[:top_n] if 0 < top_n < len(self) else np.arange(top_n)
+        top = top[np.lexsort((top, -final_score[top]))]
+
+        recommendations = self.hikes_df.iloc[top].copy()
+        recommendations["keyword_score"] = keyword_score[top]
+        recommendations["proximity_score"] = proximity_score[top]
+        recommendations["final_score"] = final_score[top]
+        return recommendations
@@ -0,0 +1,109 @@
+import base64
+import json
+import math
+import os
+import zlib
+
+from ..kvStore import create_kv_store
+
+# "local" (per worker) or "redis" (REDIS_URL, sessions shared by all workers)
+SESSION_BACKEND = os.getenv("CHAT_SESSION_STORE", "local").lower()
+# Sessions kept by the local backend (least recently used ones are dropped)
+SESSION_MAX_USERS = int(os.getenv("CHAT_SESSION_MAX_USERS", "1000"))
+# Seconds after the last message a session is dropped
+SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_TTL", "3600"))
+# Messages of the history kept per session
+SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "50"))
+# Size of a stored session in bytes (compressed), older messages are dropped beyond it
+SESSION_MAX_BYTES = int(os.getenv("CHAT_SESSION_MAX_BYTES", "65536"))
+# Characters kept of each text field of a remembered hike
+SESSION_MAX_TEXT = int(os.getenv("CHAT_SESSION_MAX_TEXT", "4000"))
+
+KEY_PREFIX = "chat-session:"
+
+
+def new_session():
+    """
+    Returns the memory of a new conversation.
+    """
+    return {
+        "conversation_state": {"user_filters": {}, "last_context": None},
+        "history": [],
+    }
+
+
+def _compact_hike(hike):
+    """
+    Keeps the fields of a recommended hike that describe it: no per-request scores, no missing values
+    and text cut to SESSION_MAX_TEXT characters.
+    """
+    compact = {}
+    for key, value in hike.items():
+        if key.endswith("_score") or value is None or (isinstance(value, float) and math.isnan(value)):
+            continue
+        if isinstance(value, str) and len(value) > SESSION_MAX_TEXT:
+            value = value[:SESSION_MAX_TEXT]
+        compact[key] = value
+    return compact
+
+
+def _encode(memory):
+    data = json.dumps(memory, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    return base64.b64encode(zlib.compress(data, 6)).decode("ascii")
+
+
+def _decode(value):
+    return json.loads(zlib.decompress(base64.b64decode(value)).decode("utf-8"))
+
+
+class SessionStore:
+    """
+    Conversation memory of the chatbot users, bounded in number and size.
+
+    Sessions are stored as compressed JSON in a key-value store: in-process with LRU eviction, or in Redis
+    so a user keeps the conversation when the next request lands on another worker. A session expires
+    SESSION_IDLE_TTL seconds after it was last saved. Before saving, the history is cut to the latest
+    SESSION_MAX_MESSAGES messages (and further while the session is larger than SESSION_MAX_BYTES) and
+    remembered hikes are stored in compact form.
+    """
+
+    def __init__(self, backend: str = SESSION_BACKEND, max_users: int = SESSION_MAX_USERS,
+                 idle_ttl: float = SESSION_IDLE_TTL):
+        self.store = create_kv_store(backend, max_users)
+        self.idle_ttl = idle_ttl
+
+    def _key(self, user_id):
+        return f"{KEY_PREFIX}{user_id}"
+
+    def load(self, user_id):
+        """
+        Returns the memory of a user (a new one if there is none or it expired).
+        """
+        value = self.store.get(self._key(user_id))
+        if value is None:
+            return new_session()
+        try:
+            return _decode(value)
+        except (ValueError, zlib.error) as e:
+            print(f"⚠️ Dropping unreadable chat session of {user_id}: {e}")
+            return new_session()
+
+    def save(self, user_id, memory):
+        """
+        Stores the memory of a user after cutting it to the size limits.
+        """
+        memory["history"] = memory.get("history", [])[-SESSION_MAX_MESSAGES:]
+        if "last_recommended_hikes" in memory:
+            memory["last_recommended_hikes"] = [_compact_hike(hike) for hike in memory["last_recommended_hikes"]]
+        value = _encode(memory)
+        while len(value) > SESSION_MAX_BYTES and memory["history"]:
+            memory["history"] = memory["history"][max(1, len(memory["history"]) // 4):]
+            value = _encode(memory)
+        self.store.set(self._key(user_id), value, self.idle_ttl)
+
+    def delete(self, user_id):
+        self.store.delete(self._key(user_id))
+
+    def stats(self):
+        return {**self.store.stats(KEY_PREFIX), "idle_ttl": self.idle_ttl, "max_messages": SESSION_MAX_MESSAGES,
+                "max_bytes": SESSION_MAX_BYTES}
@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+
+KM_PER_DEGREE_LAT = 111.195
+
+
+def haversine(lat1, lon1, lat2, lon2, earth_radius_km=6371):
+    """
+    Calculate the haversine distance in km between one point and arrays of points.
+    """
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * earth_radius_km * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class GridIndex:
+    """
+    Lat/lon grid over the hike start points, built once when the hikes are loaded.
+    A radius query only computes distances for the hikes in the grid cells that can
+    lie within the radius instead of for the whole catalog.
+    """
+
+    def __init__(self, lat, lon, cell_km=10):
+        """
+        Parameters:
+        - lat, lon: Arrays with the coordinates of the hikes (NaN for hikes without location)
+        - cell_km: Edge length of a grid cell in north-south direction
+        """
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.cell_deg = cell_km / KM_PER_DEGREE_LAT
+
+        located = np.flatnonzero(~np.isnan(self.lat) & ~np.isnan(self.lon))
+        lat_cells = np.floor(self.lat[located] / self.cell_deg).astype(np.int64)
+        lon_cells = np.floor(self.lon[located] / self.cell_deg).astype(np.int64)
+
+        # Rows sorted by cell, every cell maps to its slice of the sorted rows
+        order = np.lexsort((lon_cells, lat_cells))
+        self.rows = located[order]
+        lat_cells, lon_cells = lat_cells[order], lon_cells[order]
+        boundaries = np.flatnonzero((np.diff(lat_cells) != 0) | (np.diff(lon_cells) != 0)) + 1
+        starts = np.concatenate(([0], boundaries)) if self.rows.size else np.empty(0, dtype=np.int64)
+        ends = np.concatenate((boundaries, [self.rows.size])) if self.rows.size else np.empty(0, dtype=np.int64)
+        self.cells = {
+            (int(lat_cells[start]), int(lon_cells[start])): (int(start), int(end))
+            for start, end in zip(starts, ends)
+        }
+
+    def __len__(self):
+        return self.rows.size
+
+    def candidates(self, lat, lon, radius_km):
+        """
+        Returns the rows of all hikes in grid cells that may lie within the radius.
+        """
+        lat_radius = radius_km / KM_PER_DEGREE_LAT
+        lat_min, lat_max = lat - lat_radius, lat + lat_radius
+        # Longitude degrees get shorter towards the poles, use the widest span within the latitude range
+        cos_lat = math.cos(math.radians(min(max(abs(lat_min), abs(lat_max)), 89.9)))
+        lon_radius = lat_radius / cos_lat
+        if lon_radius >= 180:
+            return self.rows
+
+        lat_cells = range(math.floor(lat_min / self.cell_deg), math.floor(lat_max / self.cell_deg) + 1)
+        # A radius crossing the antimeridian continues at the other end of the longitude range
+        lon_spans = [(max(lon - lon_radius, -180), min(lon + lon_radius, 180))]
+        if lon - lon_radius < -180:
+            lon_spans.append((lon - lon_radius + 360, 180))
+        if lon + lon_radius > 180:
+            lon_spans.append((-180, lon + lon_radius - 360))
+        lon_cells = {lon_cell for lon_start, lon_end in lon_spans
+                     for lon_cell in range(math.floor(lon_start / self.cell_deg),
+                                           math.floor(lon_end / self.cell_deg) + 1)}
+        slices = [self.cells[(lat_cell, lon_cell)]
+                  for lat_cell in lat_cells for lon_cell in sorted(lon_cells) if (lat_cell, lon_cell) in self.cells]
+        if not slices:
+            return np.empty(0, dtype=self.rows.dtype)
+        return np.concatenate([self.rows[start:end] for start, end in slices])
+
+    def query_radius(self, lat, lon, radius_km):
+        """
+        Find all hikes within radius_km of the given point.
+
+        Returns:
+        - tuple of np.ndarray: rows of the hikes and their distances in km
+        """
+        rows = self.candidates(lat, lon, radius_km)
+        distances = haversine(lat, lon, self.lat[rows], self.lon[rows])
+        within = distances <= radius_km
+        return rows[within], distances[within]
@@ -0,0 +1,118 @@
+import math
+import os
+import re
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Shortest part of a keyword word that is looked up in the vocabulary (in characters and as share of the word)
+MIN_FRAGMENT_LENGTH = 2
+MIN_FRAGMENT_SHARE = 0.35
+# Keywords repeat a lot between requests, so their vocabulary matches are kept
+TERM_CACHE_SIZE = 4096
+# Threads used by rapidfuzz for batch matching (-1 = all cores). Requests already run in parallel
+# in the blocking pool, so one thread per call avoids oversubscribing the cores.
+FUZZY_WORKERS = int(os.getenv("FUZZY_WORKERS", "1"))
+
+
+class TextIndex:
+    """
+    Lowercased text of one hike field with an inverted index from terms to hikes, built once when the hikes load.
+
+    A keyword is first matched against the vocabulary of the field. Only hikes containing a term
+    similar to one of the keyword's words are compared with the keyword using fuzz.partial_ratio,
+    in one batched rapidfuzz call. Scores of the compared hikes are the same as before. Without
+    pruning (short texts like titles) every hike is compared.
+    """
+
+    def __init__(self, texts, prune=True):
+        """
+        Parameters:
+        - texts: Text of every hike (None for hikes without text)
+        - prune: Only compare hikes that share a similar term with the keyword
+        """
+        self.texts = [text.lower() if isinstance(text, str) else None for text in texts]
+        self.rows = np.array([row for row, text in enumerate(self.texts) if text is not None], dtype=np.int64)
+        self.prune = prune
+        if prune:
+            self._build_postings()
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _build_postings(self):
+        term_rows = defaultdict(list)
+        for row, text in enumerate(self.texts):
+            if text is not None:
+                for term in set(TOKEN_PATTERN.findall(text)):
+                    term_rows[term].append(row)
+
+        # Sorted by length, so all terms from a minimum length on are one slice
+        self.terms = sorted(term_rows, key=len)
+        self.term_lengths = np.array([len(term) for term in self.terms])
+        self.postings = [np.array(term_rows[term], dtype=np.int64) for term in self.terms]
+        # Shared by the request threads, least recently used matches are dropped first
+        self._term_cache = OrderedDict()
+        self._term_cache_lock = threading.Lock()
+
+    def _similar_terms(self, word, threshold):
+        """
+        Returns the positions of all vocabulary terms that fuzzy-match the word or a part of it.
+        A keyword may also match across a word boundary of the text (e.g. "waterfalls" in "water falls"),
+        so terms down to MIN_FRAGMENT_SHARE of the word length count as well.
+        """
+        min_length = max(MIN_FRAGMENT_LENGTH, math.ceil(len(word) * MIN_FRAGMENT_SHARE))
+        start = int(np.searchsorted(self.term_lengths, min_length))
+        if start == len(self.terms):
+            return np.empty(0, dtype=np.int64)
+        scores = process.cdist([word], self.terms[start:], scorer=fuzz.partial_ratio, score_cutoff=threshold,
+                               workers=FUZZY_WORKERS)[0]
+        return np.flatnonzero(scores) + start
+
+    def _cached_similar_terms(self, word, threshold):
+        key = (word, threshold)
+        with self._term_cache_lock:
+            positions = self._term_cache.get(key)
+            if positions is not None:
+                self._term_cache.move_to_end(key)
+                return positions
+        positions = self._similar_terms(word, threshold)
+        with self._term_cache_lock:
+            self._term_cache[key] = positions
+            self._term_cache.move_to_end(key)
+            while len(self._term_cache) > TERM_CACHE_SIZE:
+                self._term_cache.popitem(last=False)
+        return positions
+
+    def candidates(self, keyword, threshold=70):
+        """
+        Returns the rows of the hikes that are compared with the keyword.
+        """
+        if not self.prune:
+            return self.rows
+        words = TOKEN_PATTERN.findall(keyword)
+        if not words:
+            return self.rows
+        term_positions = np.unique(np.concatenate([self._cached_similar_terms(word, threshold) for word in words]))
+        if term_positions.size == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.postings[position] for position in term_positions]))
+
+    def match(self, keyword, threshold=70):
+        """
+        Fuzzy-match a keyword against the text of the candidate hikes.
+
+        Returns:
+        - tuple of np.ndarray: rows of the hikes with a similarity of at least the threshold and the similarities
+        """
+        keyword = keyword.lower()
+        rows = self.candidates(keyword, threshold)
+        if rows.size == 0:
+            return rows, np.empty(0)
+        similarities = process.cdist([keyword], [self.texts[row] for row in rows], scorer=fuzz.partial_ratio,
+                                     score_cutoff=threshold, workers=FUZZY_WORKERS, dtype=np.float64)[0]
+        matched = similarities >= threshold
+        return rows[matched], similarities[matched]
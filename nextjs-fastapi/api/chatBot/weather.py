@@ -23,7 +23,7 @@ def get_weather(location: str) -> dict:
         "appid": OPENWEATHERMAP_API_KEY,
         "units": "metric"  # Use "imperial" for Fahrenheit
     }
-    response = requests.get(base_url, params=params)
+    response = requests.get(base_url, params=params, timeout=10)
     if response.status_code == 200:
         return response.json()
     else:
@@ -0,0 +1,67 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking work (OpenAI, Supabase, scoring) runs on this pool so the event loop stays free
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+# Calls waiting for a worker beyond this number wait in the event loop instead of piling up in the pool
+MAX_PENDING_CALLS = int(os.getenv("BLOCKING_MAX_PENDING", "64"))
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+_pending = None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking function on the bounded worker pool and waits for it without blocking the event loop.
+
+    Parameters:
+    - func: Blocking function to call
+    - args, kwargs: Arguments passed to the function
+
+    Returns:
+    - The return value of the function
+    """
+    global _pending
+    if _pending is None:
+        _pending = asyncio.Semaphore(MAX_PENDING_CALLS)
+    async with _pending:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    """
+    Stops the worker pool (called on application shutdown)
+    """
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def stream_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking function on the worker pool that reports partial results through an emit(event, data)
+    callback (passed as keyword argument emit) and yields them while the function is still running.
+
+    Parameters:
+    - func: Blocking function to call, must accept an emit keyword argument
+    - args, kwargs: Arguments passed to the function
+
+    Yields:
+    - tuple: (event, data) for every emitted result, ("result", return value) last
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def emit(event, data):
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    task = asyncio.ensure_future(run_blocking(func, *args, emit=emit, **kwargs))
+    # Runs after the results emitted by the function, they are scheduled on the loop first
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        yield item
+    yield "result", await task
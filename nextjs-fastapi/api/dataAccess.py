@@ -0,0 +1,95 @@
+import os
+import threading
+
+import httpx
+from dotenv import load_dotenv
+from supabase import create_client, Client, ClientOptions
+
+# Explicitly load the environment file
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+env_path = os.path.join(project_root, ".env.local")
+load_dotenv(dotenv_path=env_path)
+
+SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+SUPABASE_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+
+# Connection pool of the HTTP session shared by all Supabase queries
+POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+POOL_KEEPALIVE = int(os.getenv("SUPABASE_POOL_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "60"))
+# Rows requested per page by fetch_all
+PAGE_SIZE = 1000
+
+_lock = threading.Lock()
+_client: Client = None
+_http_client: httpx.Client = None
+
+
+def _check_config():
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("Supabase URL or API Key is missing. Check your .env.local file.")
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=POOL_SIZE,
+        max_keepalive_connections=POOL_KEEPALIVE,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout():
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def get_supabase() -> Client:
+    """
+    Returns the Supabase client shared by the whole backend.
+    All queries go through one pooled keep-alive HTTP session, so connections are reused.
+
+    Returns:
+    - Client: Synchronous Supabase client
+    """
+    global _client, _http_client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _check_config()
+                _http_client = httpx.Client(limits=_limits(), timeout=_timeout())
+                _client = create_client(SUPABASE_URL, SUPABASE_KEY,
+                                        options=ClientOptions(httpx_client=_http_client))
+    return _client
+
+
+def fetch_all(build_query, page_size: int = PAGE_SIZE):
+    """
+    Pages through a PostgREST query so results are not cut off at the server's row limit
+
+    Parameters:
+    - build_query: Function returning a fresh query builder (a builder can't be reused between pages)
+    - page_size: Number of rows requested per page
+
+    Returns:
+    - list of dict: All rows of the query
+    """
+    rows = []
+    start = 0
+    while True:
+        page = build_query().range(start, start + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def close_supabase():
+    """
+    Closes the pooled HTTP session (called on application shutdown)
+    """
+    global _client, _http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+        _client, _http_client = None, None
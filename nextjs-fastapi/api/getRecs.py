@@ -1,18 +1,71 @@
 import os
 import sys
-from supabase import create_client, Client
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
 
 # Add the parent directory to sys.path so Python can find the recommender_system module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from .recommender_system.utils import get_recommendations
+from .recommender_system.utils import get_recommendations, get_batch_recommendations, check_ann_recall
+from .recommender_system.embedding_store import embedding_store
+from .recommender_system.feed_cache import feed_cache
+from .concurrency import run_blocking
 
 
 # Erstelle einen Router
 router = APIRouter()
 
+# Largest number of recommended users per request
+MAX_K = 100
+# Largest recall check (every sampled user is ranked twice while the embedding store is locked)
+MAX_RECALL_SAMPLE = 1000
+# Largest number of index lists searched by a recall check
+MAX_N_PROBE = 1024
+
+
+class BatchRecommendationRequest(BaseModel):
+    userIDs: list[str]
+    k: int = Field(10, ge=1, le=MAX_K)
+
 
 @router.get("/recommendations")
-async def get_recommendation(userID: str): 
-    rec_ids = get_recommendations(userID) 
-    return {"recommendedUserIDs": rec_ids}
\ No newline at end of file
+async def get_recommendation(userID: str, k: int = Query(10, ge=1, le=MAX_K), offset: int = Query(0, ge=0),
+                             exact: bool = False):
+    rec_ids = await run_blocking(get_recommendations, userID, k, offset, exact)
+    return {"recommendedUserIDs": rec_ids}
+
+
+@router.post("/recommendations/batch")
+async def get_batch_recommendation(request: BatchRecommendationRequest):
+    # Used to precompute the feeds of many users with a single call
+    rec_ids = await run_blocking(get_batch_recommendations, request.userIDs, request.k)
+    return {"recommendedUserIDs": rec_ids}
+
+
+@router.get("/recommendations/ann/recall")
+async def get_ann_recall(sample: int = Query(100, ge=1, le=MAX_RECALL_SAMPLE), k: int = Query(10, ge=1, le=MAX_K),
+                         nProbe: int | None = Query(None, ge=1, le=MAX_N_PROBE)):
+    # Compares the approximate index with the exact search
+    try:
+        return await run_blocking(check_ann_recall, sample, k, nProbe)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/recommendations/refresh")
+async def refresh_profile_embedding(userID: str):
+    # Called after a profile changed its skills or interests (or was deleted)
+    await run_blocking(embedding_store.update_profile, userID)
+    return {"status": "ok", "profiles": len(embedding_store)}
+
+
+@router.post("/recommendations/swipe")
+async def register_swipe(senderID: str, receiverID: str):
+    # Called after a swipe was stored, so the profile is excluded without waiting for the next sync
+    await run_blocking(embedding_store.swipes.add_swipe, senderID, receiverID)
+    return {"status": "ok"}
+
+
+@router.get("/recommendations/cache/stats")
+async def get_feed_cache_stats():
+    # Hit rate of the cached feeds
+    return await run_blocking(feed_cache.stats)
@@ -1,4 +1,6 @@
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Dict, Optional
@@ -8,9 +10,13 @@ from .auth import (
     verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from .getRecs import router as recs_router
-from .chatBot.chatbotLoop import chatbot_loop_api
+from .chatBot.chatbotLoop import chatbot_loop_api, chatbot
 from .chatBot.getHike import getHike
-from .chatBot.db import fetch_hike_data
+from .chatBot.hikeCatalog import hike_catalog
+from .recommender_system.embedding_store import embedding_store
+from .dataAccess import close_supabase
+from .concurrency import run_blocking, stream_blocking, shutdown_executor
+import json
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
@@ -29,9 +35,21 @@ app.add_middleware(
 # Include hike recommendation router
 app.include_router(recs_router, prefix="/api/py", tags=["recommendations"])
 
-# Load hike data during startup
-hikes = fetch_hike_data()
-print("Hikes loaded successfully!")
+# Hikes are loaded once by the hike catalog (see chatBot/hikeCatalog.py), new hikes are picked up in the background
+hike_catalog.start_refresh()
+
+# Build the profile embeddings used by /api/py/recommendations
+try:
+    embedding_store.build()
+except Exception as e:
+    print(f"Error building embedding store: {e}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Stop the catalog refresh, close the pooled Supabase HTTP session and the worker pool
+    hike_catalog.stop_refresh()
+    close_supabase()
+    shutdown_executor()
 
 # Request models
 class ChatRequest(BaseModel):
@@ -53,13 +71,13 @@ async def chat(request: ChatRequest):
         if not user_input:
             raise HTTPException(status_code=400, detail="No input provided")
 
-        # Call chatbot logic with user_id
-        raw_response = chatbot_loop_api(user_input, user_id)
+        # Call chatbot logic with user_id (blocking GPT calls run on the worker pool)
+        raw_response = await run_blocking(chatbot_loop_api, user_input, user_id)
 
         if isinstance(raw_response, dict) and raw_response.get("intent") == "hike_recommendation":
             # Process hike recommendations
             user_filters = raw_response.get("filters", {})
-            hike_recommendations = getHike(user_filters)
+            hike_recommendations = await run_blocking(getHike, user_filters)
             return {
                 "response": "Here are some hikes you might like.",
                 "hike_ids": hike_recommendations
@@ -86,13 +104,13 @@ async def groupchat(request: GroupChatRequest):
         if not user_input:
             raise HTTPException(status_code=400, detail="No input provided")
 
-        raw_response = chatbot_loop_api(user_input, user_id, is_group_chat=True)
+        raw_response = await run_blocking(chatbot_loop_api, user_input, user_id, is_group_chat=True)
         # Call chatbot logic with user_id
 
         if isinstance(raw_response, dict) and raw_response.get("intent") == "hike_recommendation":
             # Process hike recommendations
             user_filters = raw_response.get("filters", {})
-            hike_recommendations = getHike(user_filters)
+            hike_recommendations = await run_blocking(getHike, user_filters)
             return {
                 "response": "Here are some hikes you might like.",
                 "hike_ids": hike_recommendations
@@ -108,6 +126,68 @@ async def groupchat(request: GroupChatRequest):
         print(f"Error in groupchat endpoint: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+def _chat_event_stream(user_input, user_id, is_group_chat):
+    """
+    Streams a chatbot answer as server-sent events: "delta" ({"text"}) for every text delta of GPT,
+    "hikes" ({"hikes", "filters"}) as soon as hikes are scored and "done" with the same response
+    the non-streaming endpoint returns ("error" if the request failed).
+    """
+    async def events():
+        try:
+            async for event, data in stream_blocking(chatbot_loop_api, user_input, user_id, is_group_chat):
+                if event == "result":
+                    event, data = "done", data if isinstance(data, dict) else {"response": data}
+                yield _sse(event, data)
+        except Exception as e:
+            print(f"Error in chatbot stream: {e}")
+            yield _sse("error", {"detail": "Internal server error"})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/api/py/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /api/py/chat (server-sent events).
+    """
+    user_input = request.user_input.strip()
+    if not user_input:
+        raise HTTPException(status_code=400, detail="No input provided")
+    return _chat_event_stream(user_input, request.user_id, is_group_chat=False)
+
+@app.post("/api/py/groupchat/stream")
+async def groupchat_stream(request: GroupChatRequest):
+    """
+    Streaming variant of /api/py/groupchat (server-sent events).
+    """
+    user_input = request.user_input.strip()
+    if not user_input:
+        raise HTTPException(status_code=400, detail="No input provided")
+    return _chat_event_stream(user_input, request.user_id, is_group_chat=True)
+
+@app.get("/api/py/chat/sessions/stats")
+async def chat_session_stats():
+    # Number and memory use of the stored chat sessions
+    return await run_blocking(chatbot.sessions.stats)
+
+@app.get("/api/py/chat/intent/stats")
+async def chat_intent_stats():
+    # Share of the messages classified without GPT and their agreement with GPT
+    return chatbot.intent_classifier.stats()
+
+@app.get("/api/py/chat/history/stats")
+async def chat_history_stats():
+    # Tokens of conversation history sent to GPT and saved by the token budget
+    return chatbot.history.stats()
+
+@app.get("/api/py/chat/llm-cache/stats")
+async def chat_llm_cache_stats():
+    # Hit rate of the cached filter and city extraction answers
+    return await run_blocking(chatbot.llm_cache.stats)
+
 @app.post("/api/py/signup")
 async def signup(user: UserCreate):
     if user.email in users_db:
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from .dataAccess import CONNECT_TIMEOUT, REQUEST_TIMEOUT
+
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_TOKEN = os.getenv("REDIS_TOKEN")
+
+
+class LocalKV:
+    """
+    In-process key-value store with LRU eviction and a TTL per entry.
+    Only shared by the threads of one worker.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self, prefix: str = ""):
+        """
+        Number and size of the entries whose key starts with prefix (expired ones not yet dropped included)
+        """
+        with self._lock:
+            entries = [(key, value) for key, (_, value) in self._entries.items() if key.startswith(prefix)]
+        return {"backend": "local", "entries": len(entries), "max_entries": self.max_entries,
+                "bytes": sum(len(key) + len(value) for key, value in entries)}
+
+
+class RestRedisKV:
+    """
+    Redis behind an HTTP REST endpoint (REDIS_URL with REDIS_TOKEN, e.g. Upstash).
+    Each command is one POST of the command as JSON array, over a pooled keep-alive session.
+    """
+
+    def __init__(self, url: str = REDIS_URL, token: str = REDIS_TOKEN):
+        self.url = url.rstrip("/")
+        self._client = httpx.Client(headers={"Authorization": f"Bearer {token}"},
+                                    timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT))
+
+    def _command(self, *command):
+        response = self._client.post(self.url, json=[str(part) for part in command])
+        response.raise_for_status()
+        body = response.json()
+        if "error" in body:
+            raise RuntimeError(f"Redis error: {body['error']}")
+        return body.get("result")
+
+    def get(self, key: str):
+        return self._command("GET", key)
+
+    def set(self, key: str, value: str, ttl: float = None):
+        if ttl:
+            self._command("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            self._command("SET", key, value)
+
+    def delete(self, key: str):
+        self._command("DEL", key)
+
+    def clear(self):
+        # Entries of other workers are shared, they expire by their TTL
+        pass
+
+    def stats(self, prefix: str = ""):
+        """
+        Number of the keys starting with prefix. SCAN walks the whole database, only meant for monitoring.
+        """
+        entries = 0
+        cursor = "0"
+        while True:
+            cursor, keys = self._command("SCAN", cursor, "MATCH", f"{prefix}*", "COUNT", 1000)
+            entries += len(keys)
+            if str(cursor) == "0":
+                return {"backend": "redis", "entries": entries}
+
+
+class RedisKV(RestRedisKV):
+    """
+    Redis over its own protocol (redis:// or rediss:// REDIS_URL), needs the redis package.
+    """
+
+    def __init__(self, url: str = REDIS_URL, token: str = REDIS_TOKEN):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The redis package is required for redis:// URLs (pip install redis)")
+        self._redis = redis.Redis.from_url(url, password=token or None, decode_responses=True,
+                                           socket_timeout=REQUEST_TIMEOUT, socket_connect_timeout=CONNECT_TIMEOUT)
+
+    def _command(self, *command):
+        return self._redis.execute_command(*command)
+
+
+def create_kv_store(backend: str, max_entries: int = 10000):
+    """
+    Creates the key-value store for a cache
+
+    Parameters:
+    - backend: "local" (in-process) or "redis" (REDIS_URL, shared by all workers)
+    - max_entries: Number of entries kept by the local store
+
+    Returns:
+    - LocalKV, RestRedisKV or RedisKV
+    """
+    if backend == "redis":
+        if not REDIS_URL:
+            raise ValueError("REDIS_URL is missing. Check your .env.local file.")
+        if REDIS_URL.startswith(("redis://", "rediss://")):
+            return RedisKV()
+        return RestRedisKV()
+    if backend in ("", "local"):
+        return LocalKV(max_entries)
+    raise ValueError(f"Unknown key-value store backend: {backend}")
@@ -0,0 +1,190 @@
+import numpy as np
+
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 50000
+ASSIGN_BLOCK_SIZE = 8192
+
+
+class IVFIndex:
+    """
+    Approximate nearest neighbour index (inverted file) over the candidate vectors of the embedding store.
+
+    The vectors are clustered with k-means. Every row of the store is kept in the list of its
+    closest centroid, and a search only scores the rows of the n_probe lists whose centroids
+    match the query best. A higher n_probe gives better recall at the cost of latency.
+
+    All candidate vectors of the store have the same length, so ranking by inner product
+    (the recommendation score) and by euclidean distance to a centroid agree.
+    """
+
+    def __init__(self, n_lists: int = None, n_probe: int = 8, seed: int = 0):
+        """
+        Parameters:
+        - n_lists: Number of clusters (default: about sqrt of the number of profiles)
+        - n_probe: Number of clusters searched per query
+        - seed: Seed for the k-means initialisation
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.centroids = np.empty((0, 0))
+        self.list_rows: list[list[int]] = []
+        self.assignment = np.empty(0, dtype=np.intp)
+        self.slot = np.empty(0, dtype=np.intp)
+
+    def __len__(self):
+        return sum(len(rows) for rows in self.list_rows)
+
+    @property
+    def is_trained(self):
+        return self.centroids.shape[0] > 0
+
+    def train(self, vectors: np.ndarray):
+        """
+        Clusters the vectors and fills the lists with rows 0..len(vectors)-1
+
+        Parameters:
+        - vectors: (Profiles x Dimensions) candidate matrix of the embedding store
+        """
+        n = vectors.shape[0]
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n) if n else 0
+        rng = np.random.default_rng(self.seed)
+
+        sample = vectors
+        if n > KMEANS_SAMPLE_SIZE:
+            sample = vectors[rng.choice(n, KMEANS_SAMPLE_SIZE, replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].copy() if n_lists else \
+            np.empty((0, vectors.shape[1]))
+
+        for _ in range(KMEANS_ITERATIONS if n_lists else 0):
+            labels = self._nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+            # Empty clusters keep their old centroid
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        self.centroids = centroids
+        self.list_rows = [[] for _ in range(n_lists)]
+        self.assignment = np.full(max(n, 1), -1, dtype=np.intp)
+        self.slot = np.full(max(n, 1), -1, dtype=np.intp)
+        if n_lists:
+            for row, label in enumerate(self._nearest(vectors, centroids)):
+                self._append(row, int(label))
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray):
+        labels = np.empty(vectors.shape[0], dtype=np.intp)
+        centroid_norms = (centroids ** 2).sum(axis=1)
+        for start in range(0, vectors.shape[0], ASSIGN_BLOCK_SIZE):
+            block = vectors[start:start + ASSIGN_BLOCK_SIZE]
+            # argmin of |v - c|^2 = |v|^2 - 2 v.c + |c|^2, |v|^2 is the same for every centroid
+            labels[start:start + block.shape[0]] = np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1)
+        return labels
+
+    def _ensure_capacity(self, row: int):
+        if row >= self.assignment.shape[0]:
+            capacity = max(row + 1, self.assignment.shape[0] * 2)
+            for name in ("assignment", "slot"):
+                old = getattr(self, name)
+                new = np.full(capacity, -1, dtype=np.intp)
+                new[:old.shape[0]] = old
+                setattr(self, name, new)
+
+    def _append(self, row: int, label: int):
+        self._ensure_capacity(row)
+        self.assignment[row] = label
+        self.slot[row] = len(self.list_rows[label])
+        self.list_rows[label].append(row)
+
+    def add(self, row: int, vector: np.ndarray):
+        """
+        Inserts a row of the store (or moves it to a new list if its vector changed)
+
+        Parameters:
+        - row: Row index in the embedding store
+        - vector: Candidate vector of the row
+        """
+        if not self.is_trained:
+            return
+        self.remove(row)
+        self._append(row, int(self._nearest(vector[None, :], self.centroids)[0]))
+
+    def remove(self, row: int):
+        """
+        Removes a row of the store from its list
+
+        Parameters:
+        - row: Row index in the embedding store
+        """
+        if row >= self.assignment.shape[0] or self.assignment[row] < 0:
+            return
+        rows = self.list_rows[self.assignment[row]]
+        slot = self.slot[row]
+        last = rows.pop()
+        if last != row:
+            rows[slot] = last
+            self.slot[last] = slot
+        self.assignment[row] = -1
+        self.slot[row] = -1
+
+    def move(self, old_row: int, new_row: int):
+        """
+        Follows the embedding store moving a profile from old_row to new_row (after a removal)
+        """
+        if old_row >= self.assignment.shape[0] or self.assignment[old_row] < 0:
+            return
+        self._ensure_capacity(new_row)
+        label, slot = self.assignment[old_row], self.slot[old_row]
+        self.list_rows[label][slot] = new_row
+        self.assignment[new_row], self.slot[new_row] = label, slot
+        self.assignment[old_row], self.slot[old_row] = -1, -1
+
+    def candidates(self, query: np.ndarray, n_probe: int = None, min_candidates: int = 0):
+        """
+        Returns the rows of the lists closest to the query.
+        More lists than n_probe are searched if they hold fewer than min_candidates rows.
+
+        Parameters:
+        - query: Reference vector of the user
+        - n_probe: Number of lists to search (default: the index setting)
+        - min_candidates: Minimum number of rows to return if the index holds that many
+
+        Returns:
+        - np.ndarray: Row indices in the embedding store
+        """
+        if not self.is_trained:
+            return np.empty(0, dtype=np.intp)
+        n_probe = n_probe or self.n_probe
+        order = np.argsort(-(self.centroids @ query))
+        probed = []
+        count = 0
+        for i, label in enumerate(order):
+            if i >= n_probe and count >= min_candidates:
+                break
+            probed.append(self.list_rows[label])
+            count += len(self.list_rows[label])
+        if not count:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([np.asarray(rows, dtype=np.intp) for rows in probed if rows])
+
+
+def recall_at_k(exact: dict, approximate: dict):
+    """
+    Compares approximate recommendations with the exact ones
+
+    Parameters:
+    - exact: Maps user ids to the exact list of recommended ids
+    - approximate: Maps user ids to the approximate list of recommended ids
+
+    Returns:
+    - float: Share of the exact recommendations that the approximate search also found
+    """
+    found = 0
+    total = 0
+    for user_id, exact_ids in exact.items():
+        found += len(set(exact_ids) & set(approximate.get(user_id, [])))
+        total += len(exact_ids)
+    return found / total if total else 1.0
@@ -0,0 +1,354 @@
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import os
+
+from ..dataAccess import get_supabase, fetch_all
+from .similarity import (candidate_vectors, reference_vectors, candidate_dense_vectors, reference_dense_vectors,
+                         DIRECT_INTEREST_WEIGHT, bitset_words, set_bits, unpack_bitsets, direct_interest_similarity)
+from .ann_index import IVFIndex
+from .vocabulary import vocabulary
+from .swipe_index import SwipeIndex
+from .feed_cache import feed_cache
+
+SKILL_DIMENSIONS = 3
+INITIAL_CAPACITY = 64
+
+# Optional approximate nearest neighbour search for large user bases ("ivf" to enable)
+ANN_INDEX = os.getenv("RECOMMENDER_ANN_INDEX", "").lower()
+ANN_LISTS = int(os.getenv("RECOMMENDER_ANN_LISTS", "0")) or None
+ANN_PROBE = int(os.getenv("RECOMMENDER_ANN_PROBE", "8"))
+# Seconds after which all profiles are reloaded in the background (picks up profile changes other workers
+# were notified about or that were written without calling /recommendations/refresh), 0 = never
+REBUILD_INTERVAL = float(os.getenv("RECOMMENDER_REBUILD_SECONDS", "3600"))
+
+
+def _skill_row(skill_items: list[dict]):
+    """
+    Builds the skill embedding of one profile from its UserSkill rows
+
+    Parameters:
+    - skill_items: UserSkill rows with skillId and skillLevelId
+
+    Returns:
+    - numpy Array: Skill values ordered by skill name, padded with -1 to SKILL_DIMENSIONS
+    """
+    skills = np.array(vocabulary.skill_values(skill_items), dtype=float)[:SKILL_DIMENSIONS]
+    return np.pad(skills, (0, SKILL_DIMENSIONS - skills.shape[0]), mode='constant', constant_values=-1)
+
+
+class EmbeddingStore:
+    """
+    Resident store of the skill, direct interest and indirect interest embeddings of all profiles.
+    Built once from the database and afterwards updated per profile, so recommendations
+    only need matrix operations on the rows kept in memory. The profiles users already swiped on
+    are kept as bitmaps over the same rows (see swipe_index.SwipeIndex).
+
+    Rows hold the raw embeddings. Direct interests are binary and mostly empty, so they are kept as
+    bitsets (one bit per interest) and compared by popcount. Next to them the store keeps the
+    unit-normalized, weighted skill and indirect interest part of the candidate vectors
+    (see similarity.candidate_dense_vectors), so ranking all profiles against a user is a single
+    matrix-vector product plus one popcount pass over the bitsets.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Held while building; the matrices are built outside _lock and swapped in under it
+        self._build_lock = threading.RLock()
+        # Profiles updated or removed while a build is running (re-applied after the swap)
+        self._dirty = None
+        self._rebuild_thread = None
+        self.built_at = None
+        self.is_built = False
+        self.ann_index = IVFIndex(n_lists=ANN_LISTS, n_probe=ANN_PROBE) if ANN_INDEX == "ivf" else None
+        self.vocabulary_version = None
+        self._reset([])
+        self.swipes = SwipeIndex(self)
+
+    def _reset(self, profile_ids: list[str]):
+        """
+        Sets up empty matrices with room for the given profiles and a column for every
+        interest and category of the current vocabulary
+        """
+        self.n_interests = len(vocabulary.interest_ids)
+        self.n_categories = len(vocabulary.categories)
+
+        capacity = max(INITIAL_CAPACITY, len(profile_ids))
+        self.ids = []
+        self.index = {}
+        self._skill = np.full((capacity, SKILL_DIMENSIONS), -1.0)
+        self._direct_bits = np.zeros((capacity, bitset_words(self.n_interests)), dtype=np.uint64)
+        self._direct_counts = np.zeros(capacity, dtype=np.int64)
+        self._indirect = np.zeros((capacity, self.n_categories))
+        self._candidates = np.zeros((capacity, SKILL_DIMENSIONS + self.n_categories))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, user_id):
+        return user_id in self.index
+
+    @property
+    def skill_matrix(self):
+        return self._skill[:len(self.ids)]
+
+    @property
+    def direct_interest_matrix(self):
+        # Dense 0/1 copy of the bitsets
+        return unpack_bitsets(self._direct_bits[:len(self.ids)], self.n_interests)
+
+    @property
+    def direct_interest_bits(self):
+        return self._direct_bits[:len(self.ids)]
+
+    @property
+    def indirect_interest_matrix(self):
+        return self._indirect[:len(self.ids)]
+
+    @property
+    def candidate_matrix(self):
+        return self._candidates[:len(self.ids)]
+
+    def build(self):
+        """
+        Loads all profiles with their skills and interests from the database and fills the matrices.
+        The new matrices are built without holding the lock, requests keep using the current ones
+        until they are swapped in.
+        """
+        with self._build_lock:
+            with self._lock:
+                self._dirty = set()
+            try:
+                self._build()
+            finally:
+                with self._lock:
+                    dirty, self._dirty = self._dirty, None
+            # Changes that arrived while loading may be missing from the new matrices
+            for user_id in dirty:
+                self.update_profile(user_id)
+
+    def _build(self):
+        supabase = get_supabase()
+        vocabulary_version = vocabulary.ensure_fresh()
+        generation = vocabulary.digest
+        profile_ids = [item["id"] for item in fetch_all(lambda: supabase.table("Profile").select("id").order("id"))]
+        skill_rows = fetch_all(lambda: supabase.table("UserSkill")
+                                .select("profileId, skillId, skillLevelId")
+                                .order("id"))
+        user_interest_rows = fetch_all(lambda: supabase.table("UserInterest")
+                                        .select("profileId, interestId")
+                                        .order("id"))
+
+        skills_by_profile = {profile_id: [] for profile_id in profile_ids}
+        for item in skill_rows:
+            skills_by_profile.setdefault(item["profileId"], []).append(item)
+        interests_by_profile = {profile_id: [] for profile_id in profile_ids}
+        for item in user_interest_rows:
+            interests_by_profile.setdefault(item["profileId"], []).append(item["interestId"])
+
+        staged = EmbeddingStore()
+        staged._reset(profile_ids)
+        for profile_id in profile_ids:
+            staged._write_row(profile_id, skills_by_profile[profile_id], interests_by_profile[profile_id],
+                              update_candidates=False)
+        staged._candidates[:len(staged.ids)] = candidate_dense_vectors(staged.skill_matrix,
+                                                                       staged.indirect_interest_matrix)
+        if staged.ann_index is not None:
+            staged.ann_index.train(staged.fused_candidate_vectors(np.arange(len(staged.ids))))
+
+        with self._lock:
+            for name in ("n_interests", "n_categories", "ids", "index", "_skill", "_direct_bits", "_direct_counts",
+                         "_indirect", "_candidates", "ann_index"):
+                setattr(self, name, getattr(staged, name))
+            # Swipe bitmaps refer to the old rows
+            self.swipes.reset()
+            self.vocabulary_version = vocabulary_version
+            self.built_at = time.monotonic()
+            self.is_built = True
+        # Cached feeds were ranked on the old vectors
+        feed_cache.clear(generation)
+        print(f"Embedding store built with {len(self.ids)} profiles")
+
+    def _background_build(self):
+        try:
+            self.build()
+        except Exception as e:
+            print(f"Error rebuilding embedding store: {e}")
+            self.built_at = time.monotonic()  # Retried after the next interval
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return
+            self._rebuild_thread = threading.Thread(target=self._background_build, name="embedding-store-rebuild",
+                                                    daemon=True)
+            self._rebuild_thread.start()
+
+    def ensure_built(self):
+        """
+        Builds the store on first use and rebuilds it after the vocabulary changed.
+        After REBUILD_INTERVAL seconds it is rebuilt in the background while requests use the current one.
+        """
+        if self.is_built and REBUILD_INTERVAL > 0 and time.monotonic() - self.built_at > REBUILD_INTERVAL:
+            self._rebuild_in_background()
+        if not self.is_built or vocabulary.ensure_fresh() != self.vocabulary_version:
+            # Once built, requests don't wait for a rebuild another thread is running
+            if not self._build_lock.acquire(blocking=not self.is_built):
+                return
+            try:
+                if not self.is_built or vocabulary.version != self.vocabulary_version:
+                    self.build()
+            finally:
+                self._build_lock.release()
+
+    def _grow(self):
+        capacity = self._skill.shape[0] * 2
+        for name, fill in (("_skill", -1.0), ("_direct_bits", 0), ("_direct_counts", 0), ("_indirect", 0.0),
+                           ("_candidates", 0.0)):
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:old.shape[0]] = old
+            setattr(self, name, new)
+
+    def _write_row(self, profile_id: str, skill_items: list[dict], interest_ids: list[str],
+                   update_candidates: bool = True):
+        row = self.index.get(profile_id)
+        if row is None:
+            if len(self.ids) == self._skill.shape[0]:
+                self._grow()
+            row = len(self.ids)
+            self.ids.append(profile_id)
+            self.index[profile_id] = row
+
+        self._skill[row] = _skill_row(skill_items)
+        self._direct_bits[row] = 0
+        self._indirect[row] = 0.0
+        # Only interests that have a column in the matrices (the vocabulary may have grown since the build)
+        interest_ids = list(dict.fromkeys(
+            interest_id for interest_id in interest_ids
+            if vocabulary.interest_index.get(interest_id, self.n_interests) < self.n_interests))
+        set_bits(self._direct_bits[row], [vocabulary.interest_index[interest_id] for interest_id in interest_ids])
+        self._direct_counts[row] = len(interest_ids)
+        category_count = Counter(vocabulary.interest_category[interest_id] for interest_id in interest_ids)
+        for category, count in category_count.items():
+            if vocabulary.category_index[category] < self.n_categories:
+                self._indirect[row, vocabulary.category_index[category]] = count
+        if update_candidates:
+            self._candidates[row] = candidate_dense_vectors(self._skill[row:row + 1], self._indirect[row:row + 1])[0]
+            if self.ann_index is not None:
+                self.ann_index.add(row, self.fused_candidate_vectors(np.array([row]))[0])
+
+    def update_profile(self, user_id: str):
+        """
+        Reloads the embeddings of a single profile after its skills or interests changed.
+        Profiles that no longer exist are removed from the store.
+
+        Parameters:
+        - user_id: ID of the changed profile
+        """
+        self.ensure_built()
+        supabase = get_supabase()
+
+        exists = supabase.table("Profile").select("id").eq("id", user_id).execute().data
+        if not exists:
+            self.remove_profile(user_id)
+            return
+
+        skill_items = supabase.table("UserSkill") \
+            .select("profileId, skillId, skillLevelId") \
+            .eq("profileId", user_id) \
+            .execute().data
+        response = supabase.table("UserInterest").select("interestId").eq("profileId", user_id).execute().data
+        interest_ids = [item["interestId"] for item in response]
+
+        if any(interest_id not in vocabulary.interest_index for interest_id in interest_ids):
+            # Interest created since the last vocabulary check
+            vocabulary.refresh(force=True)
+        if any(vocabulary.interest_index.get(interest_id, self.n_interests) >= self.n_interests
+               for interest_id in interest_ids):
+            # A new interest changes the width of the interest matrices, so start over
+            self.build()
+            return
+
+        with self._lock:
+            self._write_row(user_id, skill_items, interest_ids)
+            if self._dirty is not None:
+                self._dirty.add(user_id)
+        feed_cache.invalidate(user_id)
+
+    def remove_profile(self, user_id: str):
+        """
+        Removes a profile by moving the last row into its place
+
+        Parameters:
+        - user_id: ID of the deleted profile
+        """
+        with self._lock:
+            if self._dirty is not None:
+                self._dirty.add(user_id)
+            row = self.index.pop(user_id, None)
+            if row is None:
+                return
+            last = len(self.ids) - 1
+            if self.ann_index is not None:
+                self.ann_index.remove(row)
+                self.ann_index.move(last, row)
+            self.swipes.move(last, row)
+            self.swipes.remove_user(user_id)
+            if row != last:
+                moved_id = self.ids[last]
+                self.ids[row] = moved_id
+                self.index[moved_id] = row
+                for matrix in (self._skill, self._direct_bits, self._direct_counts, self._indirect, self._candidates):
+                    matrix[row] = matrix[last]
+            self.ids.pop()
+        feed_cache.invalidate(user_id)
+
+    def rows_for(self, user_ids):
+        """
+        Returns the row indices of the given profile ids, skipping unknown ids
+        """
+        return np.array([self.index[user_id] for user_id in user_ids if user_id in self.index], dtype=np.intp)
+
+    def reference_matrix(self, rows: np.ndarray):
+        """
+        Returns the fused, unit-normalized vectors of the given rows,
+        as used for the users recommendations are calculated for (queries of the approximate index)
+        """
+        return reference_vectors(self._skill[rows], unpack_bitsets(self._direct_bits[rows], self.n_interests),
+                                 self._indirect[rows])
+
+    def fused_candidate_vectors(self, rows: np.ndarray):
+        """
+        Returns the weighted fused candidate vectors of the given rows with the direct interests expanded
+        (the vectors the approximate index is trained on)
+        """
+        return candidate_vectors(self._skill[rows], unpack_bitsets(self._direct_bits[rows], self.n_interests),
+                                 self._indirect[rows])
+
+    def scores(self, user_rows: np.ndarray, rows: np.ndarray = None):
+        """
+        Weighted similarity of profiles to the users in user_rows: the skill and indirect interest part as
+        matrix product, the direct interest part by popcount on the bitsets
+
+        Parameters:
+        - user_rows: Rows of the users recommendations are calculated for
+        - rows: Rows of the candidate profiles (default: all profiles)
+
+        Returns:
+        - np.ndarray: (Users x Candidates) matrix of scores
+        """
+        if rows is None:
+            rows = slice(0, len(self.ids))
+        candidate_bits = self._direct_bits[rows]
+        candidate_counts = self._direct_counts[rows]
+        scores = reference_dense_vectors(self._skill[user_rows], self._indirect[user_rows]) @ self._candidates[rows].T
+        for i, user_row in enumerate(user_rows):
+            scores[i] += DIRECT_INTEREST_WEIGHT * direct_interest_similarity(
+                candidate_bits, candidate_counts, self._direct_bits[user_row], self._direct_counts[user_row])
+        return scores
+
+
+embedding_store = EmbeddingStore()
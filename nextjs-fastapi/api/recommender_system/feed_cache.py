@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+
+from ..kvStore import create_kv_store
+
+# "local" (per worker) or "redis" (REDIS_URL, shared by all workers)
+FEED_CACHE_BACKEND = os.getenv("RECOMMENDER_FEED_CACHE", "local").lower()
+# Number of ranked profiles stored per user (pages beyond it are calculated directly)
+FEED_DEPTH = int(os.getenv("RECOMMENDER_FEED_DEPTH", "200"))
+# Seconds a feed is kept (changes of other profiles show up after this time)
+FEED_TTL = float(os.getenv("RECOMMENDER_FEED_TTL", "300"))
+# Number of feeds kept by the local backend
+FEED_CACHE_SIZE = int(os.getenv("RECOMMENDER_FEED_CACHE_SIZE", "10000"))
+
+
+class FeedCache:
+    """
+    Ranked recommendation lists ("feeds") per user, so paging through /recommendations or reopening
+    the matching tab doesn't score all profiles again.
+
+    A feed holds the best FEED_DEPTH profiles for the user. The feed of a user is dropped when the user's
+    skills or interests change (invalidate). Feeds are keyed by the generation of the embedding store build
+    (the vocabulary digest), so after a rebuild with another vocabulary no feed ranked on the old vectors is
+    read, also not from a shared backend; workers still on the old vocabulary keep using theirs. Swipes and deleted profiles only remove profiles from the
+    ranking without changing the order of the others, so they are filtered out when a page is read;
+    a page is the same as the one calculated from scratch as long as the feed still has enough profiles.
+    """
+
+    def __init__(self, backend: str = FEED_CACHE_BACKEND, depth: int = FEED_DEPTH, ttl: float = FEED_TTL,
+                 max_entries: int = FEED_CACHE_SIZE):
+        self.store = create_kv_store(backend, max_entries)
+        self.generation = ""
+        self.depth = depth
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _prefix(self):
+        return f"feed:{self.generation}:"
+
+    def _key(self, user_id: str):
+        return f"{self._prefix()}{user_id}"
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def load(self, user_id: str, k: int, offset: int):
+        """
+        Loads the feed of a user (without holding the lock of the embedding store, the backend may be remote)
+
+        Returns:
+        - dict: Feed with the ranked profile IDs, None if there is none or the page is beyond FEED_DEPTH
+        """
+        if offset + k > self.depth:
+            return None
+        value = self.store.get(self._key(user_id))
+        if value is None:
+            self._count("misses")
+            return None
+        return json.loads(value)
+
+    def page(self, feed: dict, keep, k: int, offset: int):
+        """
+        Returns a page of a loaded feed
+
+        Parameters:
+        - feed: Feed returned by load
+        - keep: Function returning False for profile IDs that must not be recommended anymore
+        - k: Number of recommended users
+        - offset: Number of best matches to skip
+
+        Returns:
+        - list of str: IDs of recommended users, None if the feed is too short for the page
+        """
+        ids = [profile_id for profile_id in feed["ids"] if keep(profile_id)]
+        if len(ids) < offset + k and not feed["complete"]:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return ids[offset:offset + k]
+
+    def put(self, user_id: str, ids: list[str]):
+        """
+        Stores the ranked profile IDs of the user (at most FEED_DEPTH)
+        """
+        value = {"ids": ids[:self.depth], "complete": len(ids) < self.depth}
+        self.store.set(self._key(user_id), json.dumps(value, separators=(",", ":")), self.ttl)
+
+    def invalidate(self, user_id: str):
+        """
+        Drops the feed of a user whose skills or interests changed
+        """
+        self.store.delete(self._key(user_id))
+        self._count("invalidations")
+
+    def clear(self, generation: str = None):
+        """
+        Drops all feeds (called after the embedding store was rebuilt). Feeds of other generations in a
+        shared backend aren't read anymore and expire by their TTL.
+
+        Parameters:
+        - generation: Generation of the new build
+        """
+        self.generation = generation or ""
+        self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            counters = {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                        "hit_rate": self.hits / requests if requests else 0.0}
+        return {**counters, "depth": self.depth, "ttl": self.ttl, "generation": self.generation,
+                **self.store.stats(self._prefix())}
+
+
+feed_cache = FeedCache()
@@ -0,0 +1,158 @@
+import numpy as np
+
+# Weights of the skill, direct interest and indirect interest similarity in the overall score
+SKILL_WEIGHT = 0.67
+DIRECT_INTEREST_WEIGHT = 0.11
+INDIRECT_INTEREST_WEIGHT = 0.22
+
+
+def normalize_rows(matrix: np.ndarray):
+    """
+    Scales every row of the matrix to unit length. Rows of length 0 stay 0.
+
+    Parameters:
+    - matrix: 2D array where each row is a vector
+
+    Returns:
+    - np.ndarray: Matrix with unit-length rows
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def reference_vectors(skill: np.ndarray, direct_interest: np.ndarray, indirect_interest: np.ndarray):
+    """
+    Builds the fused vectors of the users recommendations are calculated for.
+    Each embedding is normalized separately and the results are concatenated.
+
+    Parameters:
+    - skill: (User x 3) raw skill embeddings
+    - direct_interest: (User x Interests) raw direct interest embeddings
+    - indirect_interest: (User x Categories) raw indirect interest embeddings
+
+    Returns:
+    - np.ndarray: (User x (3 + Interests + Categories)) matrix of fused vectors
+    """
+    indirect_interest = np.where(indirect_interest == 0, 0.1, indirect_interest)
+    return np.hstack([normalize_rows(skill), normalize_rows(direct_interest), normalize_rows(indirect_interest)])
+
+
+def candidate_vectors(skill: np.ndarray, direct_interest: np.ndarray, indirect_interest: np.ndarray):
+    """
+    Builds the fused vectors of recommendation candidates. Each embedding is normalized
+    separately and weighted, so the dot product with a reference vector directly gives
+    the weighted sum of the three cosine similarities.
+
+    Parameters:
+    - skill: (User x 3) raw skill embeddings
+    - direct_interest: (User x Interests) raw direct interest embeddings
+    - indirect_interest: (User x Categories) raw indirect interest embeddings
+
+    Returns:
+    - np.ndarray: (User x (3 + Interests + Categories)) matrix of weighted fused vectors
+    """
+    direct_interest = direct_interest.copy()
+    if direct_interest.shape[1]:
+        direct_interest[direct_interest.sum(axis=1) == 0, 0] = 0.1
+    indirect_interest = np.where(indirect_interest == 0, 0.01, indirect_interest)
+    return np.hstack([
+        SKILL_WEIGHT * normalize_rows(skill),
+        DIRECT_INTEREST_WEIGHT * normalize_rows(direct_interest),
+        INDIRECT_INTEREST_WEIGHT * normalize_rows(indirect_interest),
+    ])
+
+
+def reference_dense_vectors(skill: np.ndarray, indirect_interest: np.ndarray):
+    """
+    Builds the skill and indirect interest part of reference vectors (see reference_vectors).
+    The direct interests are compared separately as bitsets (see direct_interest_similarity).
+    """
+    indirect_interest = np.where(indirect_interest == 0, 0.1, indirect_interest)
+    return np.hstack([normalize_rows(skill), normalize_rows(indirect_interest)])
+
+
+def candidate_dense_vectors(skill: np.ndarray, indirect_interest: np.ndarray):
+    """
+    Builds the weighted skill and indirect interest part of candidate vectors (see candidate_vectors).
+    The direct interests are compared separately as bitsets (see direct_interest_similarity).
+    """
+    indirect_interest = np.where(indirect_interest == 0, 0.01, indirect_interest)
+    return np.hstack([
+        SKILL_WEIGHT * normalize_rows(skill),
+        INDIRECT_INTEREST_WEIGHT * normalize_rows(indirect_interest),
+    ])
+
+
+def bitset_words(n_bits: int):
+    """
+    Returns the number of 64 bit words needed for a bitset of n_bits
+    """
+    return (n_bits + 63) // 64
+
+
+def set_bits(bitset: np.ndarray, positions):
+    """
+    Sets the given bit positions in a 1D uint64 bitset (in place)
+    """
+    for position in positions:
+        bitset[position >> 6] |= np.uint64(1) << np.uint64(position & 63)
+
+
+def unpack_bitsets(bitsets: np.ndarray, n_bits: int):
+    """
+    Expands (User x Words) uint64 bitsets into a dense (User x n_bits) 0/1 float matrix
+    """
+    as_bytes = bitsets.astype("<u8").view(np.uint8).reshape(bitsets.shape[0], -1)
+    return np.unpackbits(as_bytes, axis=1, bitorder="little")[:, :n_bits].astype(float)
+
+
+def direct_interest_similarity(candidate_bits: np.ndarray, candidate_counts: np.ndarray,
+                               reference_bits: np.ndarray, reference_count: int):
+    """
+    Cosine similarity of binary direct interest embeddings stored as bitsets: |A & B| / sqrt(|A| * |B|),
+    with the size of the intersection counted by popcount. Candidates without interests count as having
+    only the first interest, like the 0.1 fill value in candidate_vectors.
+
+    Parameters:
+    - candidate_bits: (User x Words) bitsets of the candidates
+    - candidate_counts: Number of interests of every candidate
+    - reference_bits: Bitset of the reference user
+    - reference_count: Number of interests of the reference user
+
+    Returns:
+    - np.ndarray: Cosine similarity per candidate (0 if the reference user has no interests)
+    """
+    if reference_count == 0:
+        return np.zeros(candidate_bits.shape[0])
+    shared = np.bitwise_count(candidate_bits & reference_bits).sum(axis=1, dtype=np.int64)
+    empty = candidate_counts == 0
+    if empty.any():
+        shared[empty] = int(reference_bits[0]) & 1 if reference_bits.size else 0
+    return shared / np.sqrt(np.where(empty, 1, candidate_counts) * reference_count)
+
+
+def top_k(scores: np.ndarray, k: int, offset: int = 0):
+    """
+    Returns the indices of the best scores in descending order without sorting all scores.
+    Works on the last axis, so a (User x Candidates) matrix gives one ranking per user.
+
+    Parameters:
+    - scores: 1D or 2D array of scores
+    - k: Number of indices to return
+    - offset: Number of best scores to skip (for pagination)
+
+    Returns:
+    - np.ndarray: Indices of the scores ranked offset to offset + k
+    """
+    n = scores.shape[-1]
+    end = min(offset + k, n)
+    if end <= offset:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+
+    if end < n:
+        candidates = np.argpartition(-scores, end - 1, axis=-1)[..., :end]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)[..., offset:end]
@@ -0,0 +1,185 @@
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from ..dataAccess import get_supabase, fetch_all
+
+# Number of users whose swipe bitmaps are kept (least recently used ones are dropped)
+SWIPE_CACHE_USERS = int(os.getenv("RECOMMENDER_SWIPE_CACHE_USERS", "10000"))
+# Seconds before a user's swipes are checked again for new UserSwipe rows (0 = on every request)
+SWIPE_SYNC_SECONDS = float(os.getenv("RECOMMENDER_SWIPE_SYNC_SECONDS", "0"))
+
+
+class SwipeIndex:
+    """
+    Profiles every user has swiped on, as one bitmap per user over the rows of the embedding store.
+
+    A user's swipes are loaded completely on the first request. Afterwards only UserSwipe rows from the
+    latest loaded timestamp on are fetched, and swipes reported with add_swipe are set right away.
+    Excluding the swiped profiles is a mask over the score array, so it costs the same no matter how
+    many profiles a user has swiped on. Swipes on profiles that are not in the store yet are kept by id
+    and set as soon as the profile gets a row.
+    """
+
+    def __init__(self, store, max_users: int = SWIPE_CACHE_USERS, sync_seconds: float = SWIPE_SYNC_SECONDS):
+        self.store = store
+        self.max_users = max_users
+        self.sync_seconds = sync_seconds
+        self.reset()
+
+    def reset(self):
+        """
+        Drops all bitmaps (called when the rows of the store are rebuilt)
+        """
+        with self.store._lock:
+            self.slots = OrderedDict()
+            self.watermarks = {}
+            self.synced_at = {}
+            self.unresolved = {}
+            self._free = []
+            self._bitmaps = np.zeros((0, 0), dtype=np.uint8)
+
+    def __contains__(self, user_id):
+        return user_id in self.slots
+
+    def _slot(self, user_id: str):
+        if user_id in self.slots:
+            self.slots.move_to_end(user_id)
+            return self.slots[user_id]
+        if len(self.slots) >= self.max_users:
+            evicted, slot = self.slots.popitem(last=False)
+            self._forget(evicted)
+            self._free.append(slot)
+        if not self._free:
+            old = self._bitmaps
+            capacity = max(16, old.shape[0] * 2)
+            self._bitmaps = np.zeros((capacity, old.shape[1]), dtype=np.uint8)
+            self._bitmaps[:old.shape[0]] = old
+            self._free.extend(range(capacity - 1, old.shape[0] - 1, -1))
+        slot = self._free.pop()
+        self._bitmaps[slot] = 0
+        self.slots[user_id] = slot
+        return slot
+
+    def _forget(self, user_id: str):
+        self.watermarks.pop(user_id, None)
+        self.synced_at.pop(user_id, None)
+        self.unresolved.pop(user_id, None)
+
+    def _ensure_width(self, n_rows: int):
+        width = (n_rows + 7) // 8
+        if width > self._bitmaps.shape[1]:
+            old = self._bitmaps
+            self._bitmaps = np.zeros((old.shape[0], max(width, 2 * old.shape[1])), dtype=np.uint8)
+            self._bitmaps[:, :old.shape[1]] = old
+
+    def _add_receivers(self, user_id: str, receiver_ids):
+        slot = self._slot(user_id)
+        rows = []
+        for receiver_id in receiver_ids:
+            row = self.store.index.get(receiver_id)
+            if row is None:
+                self.unresolved.setdefault(user_id, set()).add(receiver_id)
+            else:
+                rows.append(row)
+        if rows:
+            rows = np.array(rows, dtype=np.int64)
+            self._ensure_width(int(rows.max()) + 1)
+            np.bitwise_or.at(self._bitmaps[slot], rows >> 3, (1 << (rows & 7)).astype(np.uint8))
+
+    def _apply(self, swipes: list[dict], loaded: set, now: float):
+        with self.store._lock:
+            for user_id in loaded:
+                self._slot(user_id)
+                self.synced_at[user_id] = now
+            by_sender = {}
+            for item in swipes:
+                by_sender.setdefault(item["senderId"], []).append(item)
+            for user_id, items in by_sender.items():
+                if user_id not in self.slots:
+                    continue
+                self._add_receivers(user_id, [item["receiverId"] for item in items])
+                latest = max(item["timestamp"] for item in items)
+                if self.watermarks.get(user_id) is None or latest > self.watermarks[user_id]:
+                    self.watermarks[user_id] = latest
+
+    def sync(self, user_ids: list[str], block_size: int = 256):
+        """
+        Loads the swipes of users without a bitmap and the new swipes of the others.
+        The queries run without holding the lock of the store.
+
+        Parameters:
+        - user_ids: IDs of the users recommendations are calculated for
+        - block_size: Number of users per query
+        """
+        now = time.monotonic()
+        with self.store._lock:
+            new_users = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in self.slots]
+            stale_users = [user_id for user_id in dict.fromkeys(user_ids) if user_id in self.slots
+                           and now - self.synced_at.get(user_id, 0) >= self.sync_seconds]
+            watermarks = {user_id: self.watermarks.get(user_id) for user_id in stale_users}
+
+        supabase = get_supabase()
+        for users, incremental in ((new_users, False), (stale_users, True)):
+            for start in range(0, len(users), block_size):
+                block = users[start:start + block_size]
+                since = min((watermarks[user_id] for user_id in block if watermarks[user_id] is not None),
+                            default=None) if incremental else None
+
+                def build_query():
+                    query = supabase.from_("UserSwipe").select("senderId, receiverId, timestamp").in_("senderId", block)
+                    if since is not None:
+                        # From the same timestamp on, setting a bit twice doesn't matter
+                        query = query.gte("timestamp", since)
+                    return query.order("id")
+
+                self._apply(fetch_all(build_query), set(block), now)
+
+    def add_swipe(self, sender_id: str, receiver_id: str):
+        """
+        Sets a new swipe in the bitmap of the sender (if the sender has one)
+        """
+        with self.store._lock:
+            if sender_id in self.slots:
+                self._add_receivers(sender_id, [receiver_id])
+
+    def mask(self, user_id: str):
+        """
+        Returns a boolean array over the rows of the store that is True for the profiles the user swiped on.
+        The user must have been synced before.
+        """
+        with self.store._lock:
+            n_rows = len(self.store)
+            if user_id not in self.slots:
+                return np.zeros(n_rows, dtype=bool)
+            slot = self.slots[user_id]
+            if self.unresolved.get(user_id):
+                pending = self.unresolved.pop(user_id)
+                self._add_receivers(user_id, pending)
+            self._ensure_width(n_rows)
+            return np.unpackbits(self._bitmaps[slot], count=n_rows, bitorder="little").view(bool)
+
+    def remove_user(self, user_id: str):
+        """
+        Drops the bitmap of a deleted profile
+        """
+        with self.store._lock:
+            slot = self.slots.pop(user_id, None)
+            if slot is not None:
+                self._forget(user_id)
+                self._free.append(slot)
+
+    def move(self, last: int, row: int):
+        """
+        Mirrors the removal of a store row: the bit of the last row moves into the removed row
+        """
+        with self.store._lock:
+            self._ensure_width(last + 1)
+            last_byte, last_bit = last >> 3, last & 7
+            last_bits = (self._bitmaps[:, last_byte] >> last_bit) & 1
+            self._bitmaps[:, last_byte] &= np.uint8(~(1 << last_bit) & 0xFF)
+            if row != last:
+                byte, bit = row >> 3, row & 7
+                self._bitmaps[:, byte] = (self._bitmaps[:, byte] & np.uint8(~(1 << bit) & 0xFF)) | (last_bits << bit)
@@ -1,10 +1,13 @@
 import numpy as np
-from supabase import create_client, Client
-from dotenv import load_dotenv
-import os
+from supabase import Client
 from collections import Counter
 
-load_dotenv(".env.local")
+from ..dataAccess import get_supabase
+from .embedding_store import embedding_store
+from .feed_cache import feed_cache
+from .vocabulary import vocabulary
+from .similarity import top_k
+from .ann_index import recall_at_k
 
 
 def get_user_skill_embedding(user_id: str):
@@ -18,17 +21,14 @@ def get_user_skill_embedding(user_id: str):
     - numpy Array: Array of the embedding
     """
 
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase()
+    vocabulary.ensure_fresh()
 
     response = supabase.table("UserSkill") \
-    .select("SkillLevel(name, numericValue), Skill(name)") \
+    .select("skillId, skillLevelId") \
     .eq("profileId", user_id) \
-    .neq("skillId", "cm5plddd6000rjcyuzvn9d63f") \
-    .order("Skill(name)", desc=False) \
     .execute().data
-    skills = np.array([item['SkillLevel']['numericValue'] for item in response if item['SkillLevel']])
+    skills = np.array(vocabulary.skill_values(response))
     return np.pad(skills, (0, max(0, 3 - skills.shape[0])), mode='constant', constant_values=-1)
 
 
@@ -42,16 +42,14 @@ def get_user_direct_interest_embedding(user_id: int):
     Returns:
     - numpy Array: Array of the embedding
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase()
+    vocabulary.ensure_fresh()
 
     response = supabase.table("UserInterest").select("interestId").eq("profileId", user_id).execute().data
-    user_interests = [item["interestId"] for item in response]
-    response = supabase.table("Interest").select("id").execute().data
-    all_interests = [item["id"] for item in response]
 
-    interest_embedding = np.array([1 if interest in user_interests else 0 for interest in all_interests], dtype=float)
+    interest_embedding = np.zeros(len(vocabulary.interest_ids))
+    interest_embedding[[vocabulary.interest_index[item["interestId"]] for item in response
+                        if item["interestId"] in vocabulary.interest_index]] = 1
 
     return interest_embedding
 
@@ -66,17 +64,15 @@ def get_user_indirect_interest_embedding(user_id: int):
     Returns:
     - numpy Array: Array of the embedding
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase()
+    vocabulary.ensure_fresh()
 
-    response = supabase.from_("UserInterest").select("Interest(category)").eq("profileId", user_id).execute().data
-    categories_response = supabase.from_("Interest").select("category").execute().data
+    response = supabase.from_("UserInterest").select("interestId").eq("profileId", user_id).execute().data
 
-    categories_in_user_interests = [interest['Interest']['category'] for interest in response]
+    categories_in_user_interests = [vocabulary.interest_category[interest['interestId']] for interest in response
+                                    if interest['interestId'] in vocabulary.interest_category]
     category_count = Counter(categories_in_user_interests)
-    categories = sorted(list(set([category['category'] for category in categories_response])))
-    result = [category_count[category] for category in categories]
+    result = [category_count[category] for category in vocabulary.categories]
 
     interest_embedding = np.array(result)
 
@@ -97,53 +93,169 @@ def fast_cosine_sim(reference_vector: np.array, other_vectors: np.array):
     """
     dot_products = other_vectors @ reference_vector
     norms = np.linalg.norm(other_vectors, axis=1) * np.linalg.norm(reference_vector) 
-    print(norms)
     return dot_products / norms  
 
-def get_recommendations(user_id: int):
+def _rank_rows(user_row: int, excluded: np.ndarray, k: int, offset: int, exact: bool = False,
+               n_probe: int = None):
     """
-    Calculates a list of recommendations for the user based on skill, interests and given hike description
+    Ranks the profiles of the embedding store for the user in the given row.
+    Uses the approximate index if one is enabled, otherwise scores every profile.
+    The caller must hold the lock of the embedding store.
 
     Parameters:
-    - user_id: ID of the user
-    - hike_desc: Description of the hike
+    - user_row: Row of the user in the embedding store
+    - excluded: Boolean mask over the rows of the store, True for profiles that must not be recommended (or None)
+    - k: Number of recommended users
+    - offset: Number of best matches to skip (for pagination)
+    - exact: Score every profile even if an approximate index is enabled
+    - n_probe: Number of index lists searched (default: the index setting)
 
     Returns:
-    - list of int: IDs of recommended users
+    - np.ndarray: Rows of the recommended users
     """
+    ann_index = embedding_store.ann_index
+
+    if ann_index is not None and ann_index.is_trained and not exact:
+        user_embedding = embedding_store.reference_matrix(np.array([user_row]))[0]
+        n_excluded = 1 + (int(np.count_nonzero(excluded)) if excluded is not None else 0)
+        rows = ann_index.candidates(user_embedding, n_probe, min_candidates=offset + k + n_excluded)
+        overall_sim = embedding_store.scores(np.array([user_row]), rows)[0]
+        if excluded is not None:
+            overall_sim[excluded[rows]] = -np.inf
+        overall_sim[rows == user_row] = -np.inf
+    else:
+        rows = None
+        overall_sim = embedding_store.scores(np.array([user_row]))[0]
+        # Users never get recommended themselves or profiles they already swiped on
+        if excluded is not None:
+            overall_sim[excluded] = -np.inf
+        overall_sim[user_row] = -np.inf
+
+    top = top_k(overall_sim, k, offset)
+    top = top[np.isfinite(overall_sim[top])]
+    return top if rows is None else rows[top]
+
+def get_recommendations(user_id: int, k: int = 10, offset: int = 0, exact: bool = False):
+    """
+    Calculates a list of recommendations for the user based on skill and interests.
+    Profiles are scored with one product against the pre-normalized, weighted candidate
+    matrix of the embedding store plus a popcount over the direct interest bitsets,
+    and only the requested page is sorted.
 
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
-
-    response = supabase.from_("Profile").select("id").neq("id", user_id).execute().data
-    all_ids = [item["id"] for item in response]
+    Parameters:
+    - user_id: ID of the user
+    - k: Number of recommended users
+    - offset: Number of best matches to skip (for pagination)
+    - exact: Score every profile even if an approximate index is enabled
 
-    response = supabase.from_("UserSwipe").select("receiverId").eq("senderId", user_id).execute().data
-    swiped_users = [item["receiverId"] for item in response]
-    ids = [id for id in all_ids if id not in swiped_users]
+    Returns:
+    - list of int: IDs of recommended users
+    """
+    if k < 1 or offset < 0:
+        raise ValueError("k must be at least 1 and offset at least 0")
+    embedding_store.ensure_built()
+    if user_id not in embedding_store:
+        embedding_store.update_profile(user_id)
+    if user_id not in embedding_store:
+        return []
+
+    # Only swipes newer than the ones already in the user's bitmap are loaded
+    embedding_store.swipes.sync([user_id])
+    feed = None if exact else feed_cache.load(user_id, k, offset)
+
+    with embedding_store._lock:
+        if user_id not in embedding_store:
+            return []
+        swiped = embedding_store.swipes.mask(user_id)
+        if feed is not None:
+            def keep(profile_id):
+                row = embedding_store.index.get(profile_id)
+                return row is not None and not swiped[row]
+
+            page = feed_cache.page(feed, keep, k, offset)
+            if page is not None:
+                return page
+
+        if exact or offset + k > feed_cache.depth:
+            rows = _rank_rows(embedding_store.index[user_id], swiped, k, offset, exact)
+            return [embedding_store.ids[i] for i in rows]
+        rows = _rank_rows(embedding_store.index[user_id], swiped, feed_cache.depth, 0)
+        ranked_ids = [embedding_store.ids[i] for i in rows]
+
+    feed_cache.put(user_id, ranked_ids)
+    return ranked_ids[offset:offset + k]
+
+def check_ann_recall(sample_size: int = 100, k: int = 10, n_probe: int = None, seed: int = 0):
+    """
+    Validates the approximate index against the exact search on a random sample of users
 
-    user_skill_embedding = get_user_skill_embedding(user_id)
-    user_direct_interest_embedding = get_user_direct_interest_embedding(user_id)
-    user_indirect_interest_embedding = get_user_indirect_interest_embedding(user_id)
+    Parameters:
+    - sample_size: Number of users to compare
+    - k: Number of recommended users per user
+    - n_probe: Number of index lists searched (default: the index setting)
+    - seed: Seed for drawing the sample
 
+    Returns:
+    - dict: Recall of the approximate search and the number of compared users
+    """
+    embedding_store.ensure_built()
+    if embedding_store.ann_index is None:
+        raise ValueError("No approximate index enabled (set RECOMMENDER_ANN_INDEX=ivf)")
 
-    comp_skill_embeddings = get_multiple_skill_embeddings(ids)
-    comp_direct_interest_embeddings = get_multiple_direct_interest_embeddings(ids)
-    comp_indirect_interest_embeddings = get_multiple_indirect_interest_embeddings(ids)
+    with embedding_store._lock:
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(embedding_store), min(sample_size, len(embedding_store)), replace=False)
+        exact = {row: _rank_rows(row, None, k, 0, exact=True).tolist() for row in sample}
+        approximate = {row: _rank_rows(row, None, k, 0, n_probe=n_probe).tolist() for row in sample}
 
-    skill_sim = fast_cosine_sim(user_skill_embedding, comp_skill_embeddings)
-    direct_interest_sim = fast_cosine_sim(user_direct_interest_embedding, comp_direct_interest_embeddings)
-    indirect_interest_sim = fast_cosine_sim(user_indirect_interest_embedding, comp_indirect_interest_embeddings)
+    return {"recall": recall_at_k(exact, approximate), "users": len(sample), "k": k,
+            "n_probe": n_probe or embedding_store.ann_index.n_probe}
 
-    overall_sim = 0.67 * skill_sim + 0.11 * direct_interest_sim + 0.22 * indirect_interest_sim
-    
+def get_batch_recommendations(user_ids: list[str], k: int = 10, block_size: int = 256):
+    """
+    Calculates recommendations for many users at once. Scores are computed block-wise as one
+    matrix-matrix product against the candidate matrix of the embedding store (plus the
+    popcount-based direct interest similarity).
 
-    sorted_indices = np.argsort(overall_sim)[::-1]
+    Parameters:
+    - user_ids: IDs of the users to calculate recommendations for
+    - k: Number of recommended users per user
+    - block_size: Number of users scored together (bounds the size of the score matrix)
 
-    sorted_user_ids = np.array(ids)[sorted_indices].tolist()
-    
-    return sorted_user_ids[:10]
+    Returns:
+    - dict: Maps each user id to the list of IDs of its recommended users
+    """
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    embedding_store.ensure_built()
+    for user_id in user_ids:
+        if user_id not in embedding_store:
+            embedding_store.update_profile(user_id)
+    known_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id in embedding_store]
+    recommendations = {user_id: [] for user_id in user_ids}
+    if not known_ids:
+        return recommendations
+
+    embedding_store.swipes.sync(known_ids, block_size)
+
+    with embedding_store._lock:
+        known_ids = [user_id for user_id in known_ids if user_id in embedding_store]
+        for start in range(0, len(known_ids), block_size):
+            block_ids = known_ids[start:start + block_size]
+            rows = embedding_store.rows_for(block_ids)
+            overall_sim = embedding_store.scores(rows)
+
+            # Users never get recommended themselves or profiles they already swiped on
+            for i, user_id in enumerate(block_ids):
+                overall_sim[i, embedding_store.swipes.mask(user_id)] = -np.inf
+            overall_sim[np.arange(len(block_ids)), rows] = -np.inf
+
+            top = top_k(overall_sim, k)
+            for i, user_id in enumerate(block_ids):
+                user_top = top[i][np.isfinite(overall_sim[i, top[i]])]
+                recommendations[user_id] = [embedding_store.ids[j] for j in user_top]
+
+    return recommendations
 
 def get_multiple_skill_embeddings(ids: list[str]):
     """
@@ -155,28 +267,23 @@ def get_multiple_skill_embeddings(ids: list[str]):
     Returns:
     - Numpy Array: (User x 5) matrix, where each row represents the skill embedding of the respective user
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase()
+    vocabulary.ensure_fresh()
 
     response = supabase.table("UserSkill") \
-    .select("profileId, SkillLevel(numericValue), Skill(name)") \
+    .select("profileId, skillId, skillLevelId") \
     .in_("profileId", ids) \
-    .neq("skillId", "cm5plddd6000rjcyuzvn9d63f") \
-    .order("Skill(name)", desc=False) \
     .execute().data
 
     # 2️⃣ Skills pro Nutzer in Dictionary speichern
     user_skills = {user_id: [] for user_id in ids}  # Sicherstellen, dass jeder User im Dict ist
     for item in response:
-        profile_id = item["profileId"]
-        if item["SkillLevel"]:
-            user_skills[profile_id].append(item["SkillLevel"]["numericValue"])
+        user_skills[item["profileId"]].append(item)
 
-    # 3️⃣ Skill-Arrays erstellen & mit -1 auf Länge 3 padden
+    # 3️⃣ Skill-Arrays erstellen (nach Skill-Name sortiert) & mit -1 auf Länge 3 padden
     skill_arrays = []
     for user_id in ids:
-        skills = np.array(user_skills[user_id])  # Falls keine Skills → leeres np.array
+        skills = np.array(vocabulary.skill_values(user_skills[user_id]))  # Falls keine Skills → leeres np.array
         padded_skills = np.pad(skills, (0, max(0, 3 - skills.shape[0])), mode='constant', constant_values=-1)
         skill_arrays.append(padded_skills)
 
@@ -193,35 +300,26 @@ def get_multiple_direct_interest_embeddings(ids: list[str]):
     Returns:
     - Numpy Array: (User x 5) matrix, where each row represents the direct interest embedding of the respective user
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase()
+    vocabulary.ensure_fresh()
 
     response = supabase.table("UserInterest") \
     .select("profileId, interestId") \
     .in_("profileId", ids) \
     .execute().data
 
-    all_interests_response = supabase.table("Interest").select("id").execute().data
-    all_interests = [item["id"] for item in all_interests_response]
-
-    user_interest_dict = {user_id: set() for user_id in ids}  # Leeres Set für jeden Nutzer
-
-    for item in response:
-        profile_id = item["profileId"]
-        interest_id = item["interestId"]
-        user_interest_dict[profile_id].add(interest_id)
-
-    # 4️⃣ Erstellen der Interest-Matrix (One-Hot-Encoding)
-    interest_matrix = []
-    for user_id in ids:
-        user_interests = user_interest_dict[user_id]
-        interest_embedding = np.array([1.0 if interest in user_interests else 0.0 for interest in all_interests])
-        if (np.sum(interest_embedding) == 0):
-            interest_embedding[0] = 0.1
-        interest_matrix.append(interest_embedding)
+    # 4️⃣ Erstellen der Interest-Matrix (One-Hot-Encoding) direkt über die Spaltenindizes
+    row_index = {user_id: i for i, user_id in enumerate(ids)}
+    pairs = [(row_index[item["profileId"]], vocabulary.interest_index[item["interestId"]])
+             for item in response if item["interestId"] in vocabulary.interest_index]
+    interest_matrix = np.zeros((len(ids), len(vocabulary.interest_ids)))
+    if pairs:
+        rows, columns = np.array(pairs).T
+        interest_matrix[rows, columns] = 1.0
+    if interest_matrix.shape[1]:
+        interest_matrix[interest_matrix.sum(axis=1) == 0, 0] = 0.1
 
-    return np.vstack(interest_matrix)  
+    return interest_matrix  
 
 def get_multiple_indirect_interest_embeddings(ids: list[str]):
     """
@@ -233,24 +331,23 @@ def get_multiple_indirect_interest_embeddings(ids: list[str]):
     Returns:
     - Numpy Array: (User x 5) matrix, where each row represents the indirect interest embedding of the respective user
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase()
+    vocabulary.ensure_fresh()
 
     response = supabase.table("UserInterest") \
-        .select("profileId, Interest(category)") \
+        .select("profileId, interestId") \
         .in_("profileId", ids) \
         .execute().data
     
-    categories_response = supabase.table("Interest").select("category").execute().data
-    categories = sorted(list(set([cat["category"] for cat in categories_response])))  # Sortierte Kategorie-Liste
+    categories = vocabulary.categories  # Kategorie-Liste (Spalten der Embeddings)
 
     user_category_counts = {user_id: Counter() for user_id in ids}  
 
     for item in response:
         profile_id = item["profileId"]
-        category = item["Interest"]["category"]
-        user_category_counts[profile_id][category] += 1  # Hochzählen der Kategorien
+        category = vocabulary.interest_category.get(item["interestId"])
+        if category is not None:
+            user_category_counts[profile_id][category] += 1  # Hochzählen der Kategorien
 
     # 4️⃣ Kategorie-Embeddings erstellen
     category_matrix = []
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from ..dataAccess import get_supabase, fetch_all
+
+# Skills that are not part of the matching (stored on the profile for other purposes), by id or name
+EXCLUDED_SKILLS = [skill.strip() for skill in
+                   os.getenv("RECOMMENDER_EXCLUDED_SKILLS", "cm5plddd6000rjcyuzvn9d63f").split(",") if skill.strip()]
+# Seconds after which the vocabulary is checked for changes
+VOCABULARY_TTL = float(os.getenv("RECOMMENDER_VOCABULARY_TTL", "300"))
+
+
+class VocabularyRegistry:
+    """
+    Interests, skills and skill levels, loaded once and shared by all embedding functions.
+
+    Holds the column of every interest and interest category in the embeddings. Columns are stable:
+    interests and categories added later get new columns at the end, existing ones keep theirs.
+    After VOCABULARY_TTL seconds the registry checks the Interest table for changes (number of rows and
+    latest updatedAt) and reloads it only if something changed; the small skill tables are reloaded each time.
+    Every change increases the version. The digest identifies the content, so it is the same in every
+    worker that loaded the same vocabulary (unlike the version, which counts the changes one worker saw).
+    """
+
+    def __init__(self, ttl: float = VOCABULARY_TTL, excluded_skills: list[str] = EXCLUDED_SKILLS):
+        self._lock = threading.RLock()
+        self.ttl = ttl
+        self.excluded_skills = set(excluded_skills)
+        self.version = 0
+        self.checked_at = None
+        self.interest_stamp = None
+
+        self.interest_ids = []
+        self.interest_index = {}
+        self.interest_category = {}
+        self.categories = []
+        self.category_index = {}
+        self.skill_names = {}
+        self.excluded_skill_ids = set()
+        self.level_values = {}
+        self.digest = None
+
+    def _interest_stamp(self, supabase):
+        count = supabase.table("Interest").select("id", count="exact", head=True).execute().count
+        latest = supabase.table("Interest").select("updatedAt").order("updatedAt", desc=True).limit(1).execute().data
+        return count, latest[0]["updatedAt"] if latest else None
+
+    def _load_interests(self, supabase):
+        rows = fetch_all(lambda: supabase.table("Interest").select("id, category").order("id"))
+        changed = False
+        for item in rows:
+            if item["id"] not in self.interest_index:
+                self.interest_index[item["id"]] = len(self.interest_ids)
+                self.interest_ids.append(item["id"])
+                changed = True
+            changed |= self.interest_category.get(item["id"]) != item["category"]
+            self.interest_category[item["id"]] = item["category"]
+        # Categories are sorted on the first load, later ones are appended
+        new_categories = sorted(set(self.interest_category.values()) - set(self.category_index))
+        for category in new_categories:
+            self.category_index[category] = len(self.categories)
+            self.categories.append(category)
+        return changed or bool(new_categories)
+
+    def _load_skills(self, supabase):
+        skill_names = {item["id"]: item["name"] for item in
+                       fetch_all(lambda: supabase.table("Skill").select("id, name").order("id"))}
+        level_values = {item["id"]: item["numericValue"] for item in
+                        fetch_all(lambda: supabase.table("SkillLevel").select("id, numericValue").order("id"))}
+        changed = skill_names != self.skill_names or level_values != self.level_values
+        self.skill_names = skill_names
+        self.level_values = level_values
+        self.excluded_skill_ids = {skill_id for skill_id, name in skill_names.items()
+                                   if skill_id in self.excluded_skills or name in self.excluded_skills}
+        return changed
+
+    def refresh(self, force: bool = False):
+        """
+        Reloads the parts of the vocabulary that changed
+
+        Parameters:
+        - force: Reload the interests even if the change check finds nothing
+
+        Returns:
+        - bool: True if the vocabulary changed
+        """
+        supabase = get_supabase()
+        with self._lock:
+            stamp = self._interest_stamp(supabase)
+            changed = False
+            if force or stamp != self.interest_stamp:
+                changed |= self._load_interests(supabase)
+                self.interest_stamp = stamp
+            changed |= self._load_skills(supabase)
+            self.checked_at = time.monotonic()
+            if changed:
+                self.version += 1
+                self.digest = self._digest()
+                print(f"Vocabulary version {self.version}: {len(self.interest_ids)} interests, "
+                      f"{len(self.categories)} categories, {len(self.skill_names)} skills")
+            return changed
+
+    def _digest(self):
+        # Column order differs between workers but doesn't change any score, so the content is sorted
+        content = [sorted(self.interest_category.items()), sorted(self.skill_names.items()),
+                   sorted(self.level_values.items()), sorted(self.excluded_skill_ids)]
+        return hashlib.sha256(json.dumps(content, default=str).encode("utf-8")).hexdigest()[:16]
+
+    def ensure_fresh(self):
+        """
+        Loads the vocabulary on first use and checks it for changes once the TTL has passed
+
+        Returns:
+        - int: Current version
+        """
+        if self.checked_at is None or time.monotonic() - self.checked_at > self.ttl:
+            with self._lock:
+                if self.checked_at is None or time.monotonic() - self.checked_at > self.ttl:
+                    self.refresh()
+        return self.version
+
+    def skill_values(self, skill_items: list[dict]):
+        """
+        Returns the numeric skill levels of UserSkill rows (skillId, skillLevelId) ordered by skill name,
+        without excluded skills and unknown levels
+        """
+        ordered = sorted(
+            (item for item in skill_items
+             if item["skillId"] not in self.excluded_skill_ids and item["skillLevelId"] in self.level_values),
+            key=lambda item: self.skill_names.get(item["skillId"], "")
+        )
+        return [self.level_values[item["skillLevelId"]] for item in ordered]
+
+
+vocabulary = VocabularyRegistry()
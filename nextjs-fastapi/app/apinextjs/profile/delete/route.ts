@@ -1,5 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { createClient } from '@/utils/supabase/server';
+import { refreshRecommendationProfile } from '@/lib/recommendations';
 
 export async function DELETE(req: NextRequest) {
   try {
@@ -21,6 +22,9 @@ export async function DELETE(req: NextRequest) {
       if (userDeleteError) throw userDeleteError;
     }
 
+    // The profile is removed from the recommendations (update_profile drops profiles that no longer exist)
+    await refreshRecommendationProfile(user.id);
+
     return NextResponse.json({ message: 'Account deleted successfully' });
   } catch (error) {
     console.error('Error deleting account:', error);
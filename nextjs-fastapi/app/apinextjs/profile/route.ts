@@ -3,6 +3,7 @@ import { prisma } from '@/lib/prisma';
 import { createClient } from '@/utils/supabase/server';
 import { v4 as uuidv4 } from 'uuid';
 import { UserArtistWithArtist } from '@/types/Artists';
+import { refreshRecommendationProfile } from '@/lib/recommendations';
 
 export const dynamic = 'force-dynamic';
 
@@ -204,6 +205,10 @@ export async function PUT(request: NextRequest) {
       }
     });
 
+    if (interestsUpdate || skillsUpdate) {
+      await refreshRecommendationProfile(userId);
+    }
+
     // Transform the response to match expected format
     const transformedProfile = {
       ...updatedProfile,
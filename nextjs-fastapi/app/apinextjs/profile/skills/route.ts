@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { prisma } from '@/lib/prisma';
 import { createClient } from '@/utils/supabase/server';
+import { refreshRecommendationProfile } from '@/lib/recommendations';
 
 export async function GET(request: NextRequest) {
   try {
@@ -61,6 +62,8 @@ export async function POST(request: NextRequest) {
       }
     });
 
+    await refreshRecommendationProfile(user.id);
+
     return NextResponse.json(userSkill);
   } catch (error) {
     console.error('Error updating skill:', error);
@@ -92,6 +95,8 @@ export async function DELETE(request: NextRequest) {
       }
     });
 
+    await refreshRecommendationProfile(user.id);
+
     return NextResponse.json({ success: true });
   } catch (error) {
     console.error('Error deleting skill:', error);
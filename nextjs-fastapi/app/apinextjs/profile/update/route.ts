@@ -3,6 +3,7 @@ import { prisma} from '@/lib/prisma';
 import { createClient } from '@/utils/supabase/server';
 import { Artist, UserArtist } from '@prisma/client';
 import { Prisma } from '@prisma/client';
+import { refreshRecommendationProfile } from '@/lib/recommendations';
 export const maxDuration = 25;
 
 type UserArtistWithArtist = Prisma.UserArtistGetPayload<{
@@ -155,6 +156,10 @@ export async function POST(req: NextRequest) {
       }
     });
 
+    if (interestsUpdate || skillsUpdate) {
+      await refreshRecommendationProfile(user.id);
+    }
+
     return NextResponse.json(updatedProfile);
   } catch (error) {
     console.error('Error updating profile:', error);
@@ -0,0 +1,16 @@
+// Tells the recommendation service that the skills or interests of a profile changed (or the profile was deleted),
+// so it updates the profile's embedding and drops its cached feed. Errors are only logged: the profile change
+// itself succeeded, the service picks the profile up again on its next rebuild.
+export async function refreshRecommendationProfile(userId: string) {
+  try {
+    const response = await fetch(
+      `${process.env.NEXT_PUBLIC_FASTAPI_URL}/api/py/recommendations/refresh?userID=${encodeURIComponent(userId)}`,
+      { method: 'POST' }
+    );
+    if (!response.ok) {
+      console.error('Failed to refresh recommendation profile:', await response.text());
+    }
+  } catch (error) {
+    console.error('Recommendations service is unavailable, profile not refreshed:', error);
+  }
+}